@@ -0,0 +1,225 @@
+import argparse
+import csv
+import functools
+import json
+import multiprocessing
+import os
+import sys
+
+import degrees
+from util import SearchStats, StatsSummary
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        usage="python batch.py [directory] [--input pairs.csv] [--format jsonl|csv] [--workers N] [--landmarks K] [--costars]",
+        description="Answer many degrees-of-separation queries against one loaded graph.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--input", default="-",
+                        help="CSV file of source,target pairs (names or IDs), - for stdin")
+    parser.add_argument("--output", default="-", help="output file, - for stdout")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunksize", type=int, default=16)
+    parser.add_argument("--stats", nargs="?", const="-", metavar="FILE",
+                        help="add search metrics to every result and write a JSON summary "
+                             "to FILE (stderr by default)")
+    parser.add_argument("--compact", action="store_true",
+                        help="load the star graph into compact integer arrays")
+    parser.add_argument("--cache", action="store_true",
+                        help="load the compact graph from a binary snapshot")
+    parser.add_argument("--landmarks", type=int, metavar="K",
+                        help="search with a K-landmark distance index (implies --compact)")
+    parser.add_argument("--costars", action="store_true",
+                        help="search over a precomputed co-star index (implies --compact)")
+    args = parser.parse_args()
+
+    data = (args.directory, args.compact or bool(args.landmarks) or args.costars,
+            args.cache, args.landmarks, args.costars)
+    print("Loading data...", file=sys.stderr)
+    _load(*data)
+    print("Data loaded.", file=sys.stderr)
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8", newline="")
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    summary = StatsSummary() if args.stats else None
+    with source, output:
+        results = run(read_pairs(source), args.workers, args.chunksize, data,
+                      stats=summary is not None)
+        write_results(results, output, args.format, summary)
+
+    if summary is not None:
+        report = json.dumps(summary.as_dict(), indent=2)
+        if args.stats == "-":
+            print(report, file=sys.stderr)
+        else:
+            with open(args.stats, "w") as f:
+                f.write(report + "\n")
+
+
+def read_pairs(f):
+    """
+    Yield (source, target) pairs from a CSV file with one pair per row.
+    Blank rows, rows starting with # and a `source,target` header are skipped.
+
+    Rows without exactly two columns yield (source, target, error) with
+    their first two columns, if any, so `solve` answers them with the
+    error in their place in the output rather than ending the batch.
+    """
+    reader = csv.reader(f)
+    for row in reader:
+        if not row or row[0].startswith("#"):
+            continue
+        if len(row) != 2:
+            source, target = (row + ["", ""])[:2]
+            yield (source.strip(), target.strip(),
+                   f"Line {reader.line_num}: expected source,target but got {row}")
+            continue
+        if [value.strip().lower() for value in row] == ["source", "target"]:
+            continue
+        yield row[0].strip(), row[1].strip()
+
+
+def run(pairs, workers, chunksize=16, data=None, stats=False):
+    """
+    Answer every (source, target) pair and yield the results in input order,
+    with search metrics if `stats` is set.
+
+    Pairs are spread across a pool of `workers` processes. With the fork
+    start method the workers share the graph already loaded in this process
+    copy-on-write (or through the mapped snapshot); otherwise each worker
+    loads `data`, a (directory, compact, cache, landmarks, costars) tuple, itself.
+    """
+    answer = functools.partial(solve, stats=stats)
+    if workers <= 1:
+        yield from map(answer, pairs)
+        return
+
+    if multiprocessing.get_start_method() == "fork":
+        pool = multiprocessing.Pool(workers)
+    else:
+        pool = multiprocessing.Pool(workers, initializer=_load, initargs=data)
+    with pool:
+        yield from pool.imap(answer, pairs, chunksize)
+
+
+def _load(directory, compact, cache, landmarks, costars, index_names=True):
+    """
+    Load the dataset and the name index, and the landmark and co-star
+    indexes if asked for.
+    """
+    degrees.load_data(directory, compact=compact, cache=cache, index_names=index_names)
+    if landmarks:
+        degrees.load_landmarks(directory, landmarks)
+    if costars:
+        degrees.load_costars(eager=True)
+
+
+def _reload(data, records):
+    """
+    Load the dataset like `_load`, with `data` its arguments, then apply
+    the update `records` made since it was first loaded.
+    """
+    _load(*data)
+    if records:
+        degrees.update_data(records)
+
+
+def solve(pair, stats=False):
+    """
+    Returns the result for one (source, target) pair as a dictionary,
+    including the metrics of the search if `stats` is set. A pair with
+    an error from `read_pairs` is answered with that error.
+    """
+    result = {
+        "source": pair[0],
+        "target": pair[1],
+        "source_id": None,
+        "target_id": None,
+        "degrees": None,
+        "path": None
+    }
+    if len(pair) > 2:
+        result["error"] = pair[2]
+        return result
+    try:
+        source = resolve(pair[0])
+        target = resolve(pair[1])
+    except LookupError as e:
+        result["error"] = str(e)
+        return result
+
+    result["source_id"] = source
+    result["target_id"] = target
+    search_stats = SearchStats() if stats else None
+    path = find_path(source, target, search_stats)
+    if search_stats is not None:
+        result["stats"] = search_stats.as_dict()
+    if path is None:
+        result["error"] = "Not connected."
+    else:
+        result["degrees"] = len(path)
+        result["path"] = [list(step) for step in path]
+    return result
+
+
+def find_path(source, target, stats=None):
+    """
+    Returns `shortest_path` using the fastest search that is loaded:
+    goal-directed with a landmark index, bidirectional otherwise.
+    """
+    if degrees.landmarks is not None:
+        return degrees.shortest_path(source, target, goal_directed=True, stats=stats)
+    return degrees.shortest_path(source, target, bidirectional=True, stats=stats)
+
+
+def resolve(value):
+    """
+    Returns the person_id for an IMDB id or a name, resolving ambiguous
+    names without asking, and raising LookupError if there is none.
+    """
+    if value in degrees.people:
+        return value
+    person_id = degrees.person_id_for_name(value, interactive=False)
+    if person_id is None:
+        raise LookupError(f"Person not found: {value}")
+    return person_id
+
+
+def write_results(results, output, format, summary=None):
+    """
+    Stream `results` to `output` as JSON lines or CSV rows,
+    adding their search metrics to `summary` if given.
+    """
+    if format == "jsonl":
+        for result in results:
+            if summary is not None and "stats" in result:
+                summary.add(result["stats"])
+            output.write(json.dumps(result) + "\n")
+        return
+
+    writer = csv.writer(output)
+    header = ["source", "target", "degrees", "path", "error"]
+    if summary is not None:
+        header += SearchStats.FIELDS
+    writer.writerow(header)
+    for result in results:
+        path = result["path"]
+        row = [
+            result["source"],
+            result["target"],
+            "" if result["degrees"] is None else result["degrees"],
+            "" if path is None else " ".join(f"{movie_id}:{person_id}" for movie_id, person_id in path),
+            result.get("error", "")
+        ]
+        if summary is not None:
+            if "stats" in result:
+                summary.add(result["stats"])
+                row += [result["stats"][field] for field in SearchStats.FIELDS]
+            else:
+                row += [""] * len(SearchStats.FIELDS)
+        writer.writerow(row)
+
+
+if __name__ == "__main__":
+    main()
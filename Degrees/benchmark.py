@@ -0,0 +1,139 @@
+import argparse
+import json
+import platform
+import random
+import resource
+import sys
+import time
+
+import batch
+import degrees
+from util import SearchStats
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        usage="python benchmark.py [directory] [--queries N] [--seed S] [--search MODE] [--json FILE]",
+        description="Measure load time, peak memory and search latency on a dataset.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--search", choices=["bfs", "bidirectional", "goal_directed"],
+                        default="bidirectional")
+    parser.add_argument("--json", metavar="FILE", help="also write the report as JSON")
+    parser.add_argument("--compact", action="store_true",
+                        help="load the star graph into compact integer arrays")
+    parser.add_argument("--cache", action="store_true",
+                        help="load the compact graph from a binary snapshot")
+    parser.add_argument("--landmarks", type=int, metavar="K",
+                        help="build or load a K-landmark distance index (implies --compact)")
+    parser.add_argument("--costars", action="store_true",
+                        help="search over a precomputed co-star index (implies --compact)")
+    args = parser.parse_args()
+
+    report = run(args)
+    for key, value in report.items():
+        print(f"{key}: {value}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def run(args):
+    """
+    Load the dataset and time `args.queries` searches between random
+    pairs of people, drawn with `args.seed` so that runs compare.
+    Each backend should be measured in its own process, since peak
+    memory only ever grows.
+    """
+    start = time.perf_counter()
+    batch._load(args.directory, args.compact or bool(args.landmarks) or args.costars,
+                args.cache, args.landmarks, args.costars, index_names=False)
+    load_time = time.perf_counter() - start
+    load_rss = peak_rss()
+
+    # Only pick people who starred in something, in a stable order
+    rng = random.Random(args.seed)
+    candidates = sorted(
+        person_id for person_id in degrees.people
+        if degrees.people[person_id]["movies"]
+    )
+    pairs = [(rng.choice(candidates), rng.choice(candidates)) for _ in range(args.queries)]
+
+    # Latency is timed without metrics, then each search is repeated
+    # with a SearchStats to count its work
+    latencies = []
+    explored = []
+    peak_frontiers = []
+    lengths = []
+    for source, target in pairs:
+        start = time.perf_counter()
+        path = degrees.shortest_path(
+            source, target,
+            bidirectional=args.search == "bidirectional",
+            goal_directed=args.search == "goal_directed")
+        latencies.append(time.perf_counter() - start)
+        if path is not None:
+            lengths.append(len(path))
+
+        stats = SearchStats()
+        degrees.shortest_path(
+            source, target,
+            bidirectional=args.search == "bidirectional",
+            goal_directed=args.search == "goal_directed",
+            stats=stats)
+        explored.append(stats.expanded)
+        peak_frontiers.append(stats.peak_frontier)
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "directory": args.directory,
+        "backend": "cache" if args.cache else "compact" if degrees.graph is not None else "dict",
+        "search": args.search,
+        "people": len(degrees.people),
+        "movies": len(degrees.movies),
+        "queries": args.queries,
+        "seed": args.seed,
+        "connected": len(lengths),
+        "mean_degrees": round(sum(lengths) / len(lengths), 3) if lengths else None,
+        "load_seconds": round(load_time, 3),
+        "load_peak_rss_mb": round(load_rss, 1),
+        "peak_rss_mb": round(peak_rss(), 1),
+        "latency_ms": {
+            name: round(percentile(latencies, q) * 1000, 3)
+            for name, q in [("p50", 50), ("p90", 90), ("p99", 99), ("max", 100)]
+        },
+        "explored": {
+            name: percentile(explored, q)
+            for name, q in [("p50", 50), ("p90", 90), ("p99", 99), ("max", 100)]
+        },
+        "peak_frontier": {
+            name: percentile(peak_frontiers, q)
+            for name, q in [("p50", 50), ("p90", 90), ("p99", 99), ("max", 100)]
+        }
+    }
+
+
+def percentile(values, q):
+    """
+    Returns the `q`th percentile of `values` (nearest rank).
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    rank = max(1, -(-q * len(values) // 100))
+    return values[min(rank, len(values)) - 1]
+
+
+def peak_rss():
+    """
+    Returns the peak resident set size of this process in megabytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+if __name__ == "__main__":
+    main()
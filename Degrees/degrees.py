@@ -1,6 +1,12 @@
+import argparse
 import csv
 import sys
+import time
 
+import snapshot
+from graph import CoStarIndex, Graph, check_records
+from landmarks import FILENAME as LANDMARKS_FILENAME, LandmarkIndex
+from nameindex import NameIndex, rank_key
 from util import Node, StackFrontier, QueueFrontier
 
 # Maps names to a set of corresponding person_ids
@@ -12,11 +18,38 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Compact integer graph, used instead of the dictionaries above when loaded
+graph = None
 
-def load_data(directory):
+# Landmark distance index over `graph`, when loaded
+landmarks = None
+
+# Prefix and fuzzy name lookups, when loaded
+name_index = None
+
+
+def load_data(directory, compact=False, cache=False, index_names=False):
     """
     Load data from CSV files into memory.
+
+    With `compact` set, the star graph is loaded into a `Graph` and
+    `names`, `people` and `movies` become read-only views of it.
+    With `cache` set, the graph is memory-mapped from a binary snapshot
+    next to the CSV files, which is (re)written whenever it is missing
+    or older than the CSV files.
+    With `index_names` set, a `NameIndex` is built as well.
     """
+    global graph, names, people, movies
+
+    if compact or cache:
+        graph = snapshot.load(directory) if cache else Graph.from_csv(directory)
+        names = graph.names
+        people = graph.people
+        movies = graph.movies
+        if index_names:
+            load_name_index()
+        return
+
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
@@ -51,15 +84,177 @@ def load_data(directory):
             except KeyError:
                 pass
 
+    if index_names:
+        load_name_index()
+
+
+def load_name_index():
+    """
+    Build the name index over the loaded people, ranking candidates
+    by the size of their filmography, with its trigram index.
+    """
+    global name_index
+
+    if graph is not None and graph.updated():
+        counts = (len(graph.movies_of(i)) for i in range(len(graph.person_ids)))
+        entries = zip(graph.person_ids, graph.person_names, graph.person_births, counts)
+    elif graph is not None:
+        offsets = graph.person_offsets
+        counts = (offsets[i + 1] - offsets[i] for i in range(len(graph.person_ids)))
+        entries = zip(graph.person_ids, graph.person_names, graph.person_births, counts)
+    else:
+        entries = (
+            (person_id, person["name"], person["birth"], len(person["movies"]))
+            for person_id, person in people.items()
+        )
+    name_index = NameIndex(entries)
+    name_index.build_trigrams()
+
+
+def load_landmarks(directory, count):
+    """
+    Load the landmark index with `count` landmarks stored next to the
+    CSV files, building and saving it first if it is missing or stale.
+    Needs the compact graph.
+    """
+    global landmarks
+
+    if graph is None:
+        raise ValueError("Landmarks need the compact graph, load the data with compact=True")
+    landmarks = LandmarkIndex.load(directory, graph, count, snapshot.source_stats(directory))
+
+
+def load_costars(eager=False, max_entries=None):
+    """
+    Give the compact graph a co-star index, so searches scan each person's
+    deduplicated co-stars instead of walking their movies.
+
+    With `eager` set every row is built now, otherwise rows are memoized
+    on first use and capped at `max_entries` co-stars in total.
+    """
+    if graph is None:
+        raise ValueError("The co-star index needs the compact graph, load the data with compact=True")
+    graph.costars = CoStarIndex(graph, max_entries)
+    if eager:
+        graph.costars.build()
+
+
+def update_data(records, directory=None):
+    """
+    Add people, movies and star edges to the loaded data without
+    reloading it. `records` are ("person", id, name, birth),
+    ("movie", id, title, year) and ("star", person_id, movie_id)
+    tuples; known people and movies, known edges and stars of unknown
+    people or movies are skipped.
+
+    The name index, co-star rows and landmark distances touched by the
+    new edges are brought up to date. With `directory` set, the records
+    are also appended to its snapshot and the landmark index is saved.
+
+    All records are checked before any is applied, and a bad one raises
+    ValueError with the data left as it was.
+
+    Returns the new edges as (person_id, movie_id) pairs, for use with
+    `path_is_stale`.
+    """
+    records = check_records(records)
+    added = {}
+    for record in records:
+        if record[0] == "person" and record[1] not in people:
+            added.setdefault(record[1], record)
+
+    if graph is not None:
+        edges = graph.apply(records)
+        if graph.costars is not None:
+            graph.costars.invalidate({
+                person for _, movie in edges for person in graph.stars_of(movie)
+            })
+        if landmarks is not None:
+            landmarks.update(edges)
+        edges = [(graph.person_ids[person], graph.movie_ids[movie]) for person, movie in edges]
+    else:
+        edges = []
+        for kind, *values in records:
+            if kind == "person" and values[0] not in people:
+                person_id, name, birth = values
+                people[person_id] = {"name": name, "birth": birth, "movies": set()}
+                names.setdefault(name.lower(), set()).add(person_id)
+            elif kind == "movie" and values[0] not in movies:
+                movie_id, title, year = values
+                movies[movie_id] = {"title": title, "year": year, "stars": set()}
+            elif kind == "star":
+                person_id, movie_id = values
+                if (person_id in people and movie_id in movies
+                        and movie_id not in people[person_id]["movies"]):
+                    people[person_id]["movies"].add(movie_id)
+                    movies[movie_id]["stars"].add(person_id)
+                    edges.append((person_id, movie_id))
+
+    if name_index is not None:
+        for _, person_id, name, birth in added.values():
+            name_index.add(person_id, name, birth)
+        for person_id in {person_id for person_id, _ in edges}:
+            person = people[person_id]
+            name_index.update_count(person_id, person["name"], len(person["movies"]))
+
+    if directory is not None:
+        if graph is not None:
+            snapshot.append(directory, records)
+        if landmarks is not None:
+            landmarks.write(f"{directory}/{LANDMARKS_FILENAME}", snapshot.source_stats(directory))
+    return edges
+
+
+def path_is_stale(source, target, path, edges):
+    """
+    Returns True if `path`, a shortest path (or None) found between two
+    person_ids before the (person_id, movie_id) `edges` were added, might
+    no longer be the shortest.
+
+    A shorter path has to pass through a person on a new edge, so with
+    the landmark index the path is only stale if a lower bound through
+    one of them is below its length. Without it, any path of more than
+    one step is treated as stale.
+    """
+    if not edges or (path is not None and len(path) <= 1):
+        return False
+    if landmarks is None:
+        return True
+
+    source, target = graph.person_index[source], graph.person_index[target]
+    if path is None:
+        return landmarks.bounds(source, target)[0] is not None
+    for person_id, _ in edges:
+        person = graph.person_index[person_id]
+        to_source = landmarks.bounds(source, person)[0]
+        to_target = landmarks.bounds(person, target)[0]
+        if to_source is not None and to_target is not None and to_source + to_target < len(path):
+            return True
+    return False
+
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser(
+        usage="python degrees.py [directory] [--compact] [--cache] [--landmarks K] [--costars]")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--compact", action="store_true",
+                        help="load the star graph into compact integer arrays")
+    parser.add_argument("--cache", action="store_true",
+                        help="load the compact graph from a binary snapshot")
+    parser.add_argument("--landmarks", type=int, metavar="K",
+                        help="search with a K-landmark distance index (implies --compact)")
+    parser.add_argument("--costars", action="store_true",
+                        help="search over a precomputed co-star index (implies --compact)")
+    args = parser.parse_args()
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    load_data(args.directory, compact=args.compact or bool(args.landmarks) or args.costars,
+              cache=args.cache)
+    if args.costars:
+        load_costars(eager=True)
+    if args.landmarks:
+        load_landmarks(args.directory, args.landmarks)
     print("Data loaded.")
 
     source = person_id_for_name(input("Name: "))
@@ -69,7 +264,10 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    if landmarks is not None:
+        path = shortest_path(source, target, goal_directed=True)
+    else:
+        path = shortest_path(source, target, bidirectional=True)
 
     if path is None:
         print("Not connected.")
@@ -84,14 +282,50 @@ def main():
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def shortest_path(source, target, bidirectional=False, goal_directed=False, stats=None):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
     If no possible path, returns None.
+
+    With `bidirectional` set, the search grows from both ends
+    (see `bidirectional_search`). With `goal_directed` set, an A* search
+    guided by the landmark index is used (see `load_landmarks`).
+    A `util.SearchStats` passed as `stats` is filled in with metrics
+    of the search; without it nothing is measured.
     """
+    if stats is None:
+        return _search(source, target, bidirectional, goal_directed, None)
+
+    start = time.perf_counter()
+    path = _search(source, target, bidirectional, goal_directed, stats)
+    stats.seconds = time.perf_counter() - start
+    stats.path_length = None if path is None else len(path)
+    return path
 
+
+def _search(source, target, bidirectional, goal_directed, stats):
+    """
+    Runs the search `shortest_path` asked for.
+    """
+    if goal_directed:
+        if landmarks is None:
+            raise ValueError("Goal-directed search needs the landmark index, see load_landmarks")
+        return _graph_path(source, target, landmarks.shortest_path, stats)
+    if graph is not None:
+        search = graph.bidirectional_search if bidirectional else graph.shortest_path
+        return _graph_path(source, target, search, stats)
+    if bidirectional:
+        return bidirectional_search(source, target, stats)
+    return breadth_first_search(source, target, stats)
+
+
+def breadth_first_search(source, target, stats=None):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs that connect
+    the source to the target, or None, using a plain breadth-first search.
+    """
     # TODO
     # Eigener Code
 
@@ -131,20 +365,261 @@ def shortest_path(source, target):
         explored.add(node.state)
 
         # Add neighbors to frontier
-        for action, state in neighbors_for_person(node.state): #Using the neighbor_for_person-function from below
+        neighbors = neighbors_for_person(node.state)
+        for action, state in neighbors: #Using the neighbor_for_person-function from below
             if not frontier.contains_state(state) and state not in explored:
                 child = Node(state=state, parent=node, action=action)
                 frontier.add(child)
 
+        if stats is not None:
+            stats.expanded += 1
+            stats.neighbor_checks += len(neighbors)
+            stats.peak_frontier = max(stats.peak_frontier, len(frontier.frontier))
+
     # Ende des eigenen Code
     raise NotImplementedError
 
 
-def person_id_for_name(name):
+def bidirectional_search(source, target, stats=None):
+    """
+    Returns the same path as `shortest_path`, but runs a breadth-first
+    search from the source and from the target at the same time.
+
+    Each step expands one whole level of the smaller frontier, so both
+    searches only have to reach about half the distance.
+    If no possible path, returns None.
+    """
+    if source == target:
+        return []
+
+    # Maps every reached person to the (movie_id, person_id) step that
+    # leads back towards the source (forward) or the target (backward)
+    forward = {source: None}
+    backward = {target: None}
+    forward_frontier = [source]
+    backward_frontier = [target]
+
+    while forward_frontier and backward_frontier:
+
+        # Always expand the side with fewer people waiting
+        if len(forward_frontier) <= len(backward_frontier):
+            frontier, visited, other = forward_frontier, forward, backward
+        else:
+            frontier, visited, other = backward_frontier, backward, forward
+
+        # Expand the whole level, keeping the shortest meeting point
+        next_frontier = []
+        meeting = None
+        best = None
+        for person_id in frontier:
+            neighbors = neighbors_for_person(person_id)
+            if stats is not None:
+                stats.expanded += 1
+                stats.neighbor_checks += len(neighbors)
+            for movie_id, neighbor in neighbors:
+                if neighbor in visited:
+                    continue
+                visited[neighbor] = (movie_id, person_id)
+                next_frontier.append(neighbor)
+                if neighbor in other:
+                    length = _steps(other, neighbor)
+                    if best is None or length < best:
+                        meeting, best = neighbor, length
+
+        if stats is not None:
+            waiting = backward_frontier if visited is forward else forward_frontier
+            stats.peak_frontier = max(stats.peak_frontier, len(next_frontier) + len(waiting))
+
+        if meeting is not None:
+            return _join(forward, backward, meeting)
+
+        if visited is forward:
+            forward_frontier = next_frontier
+        else:
+            backward_frontier = next_frontier
+
+    return None
+
+
+def all_shortest_paths(source, target):
+    """
+    Yields every shortest list of (movie_id, person_id) pairs that
+    connect the source to the target, one at a time.
+
+    A single breadth-first search records the predecessor DAG, and the
+    paths are only built while iterating. Nothing is yielded if there
+    is no possible path.
+    """
+    if graph is not None:
+        dag = _shortest_path_dag(graph.person_index[source], graph.person_index[target], graph.neighbors)
+        for path in _dag_paths(dag, graph.person_index[source], graph.person_index[target]):
+            yield [(graph.movie_ids[movie], graph.person_ids[person]) for movie, person in path]
+    else:
+        dag = _shortest_path_dag(source, target, neighbors_for_person)
+        yield from _dag_paths(dag, source, target)
+
+
+def count_shortest_paths(source, target):
+    """
+    Returns the number of shortest paths between the source and the
+    target without building them, 0 if there is no possible path.
+    """
+    if graph is not None:
+        source, target = graph.person_index[source], graph.person_index[target]
+        predecessors, levels = _shortest_path_dag(source, target, graph.neighbors)
+    else:
+        predecessors, levels = _shortest_path_dag(source, target, neighbors_for_person)
+    if target not in predecessors and source != target:
+        return 0
+
+    # Paths into each person add up over their predecessors, level by level
+    counts = {source: 1}
+    for level in levels:
+        for person in level:
+            counts[person] = sum(counts[parent] for _, parent in predecessors[person])
+    return counts[target]
+
+
+def _shortest_path_dag(source, target, neighbors):
+    """
+    Breadth-first search from `source` that stops after the level where
+    `target` is reached, recording for every person all (movie, person)
+    predecessors one level closer to `source`.
+
+    Returns the predecessors and the list of levels after the first.
+    """
+    depths = {source: 0}
+    predecessors = {}
+    levels = []
+    frontier = [source]
+
+    while frontier and target not in depths:
+        next_frontier = []
+        for person in frontier:
+            depth = depths[person] + 1
+            for movie, neighbor in neighbors(person):
+                if neighbor == person:
+                    continue
+                known = depths.get(neighbor)
+                if known is None:
+                    depths[neighbor] = depth
+                    predecessors[neighbor] = [(movie, person)]
+                    next_frontier.append(neighbor)
+                elif known == depth:
+                    predecessors[neighbor].append((movie, person))
+        levels.append(next_frontier)
+        frontier = next_frontier
+
+    return predecessors, levels
+
+
+def _dag_paths(dag, source, target):
+    """
+    Yields the paths from `source` to `target` through a predecessor DAG,
+    walking backwards from `target` depth first, in a stable order.
+    """
+    predecessors, _ = dag
+    if source != target and target not in predecessors:
+        return
+
+    # Each entry is a person and the path suffix from them to the target
+    stack = [(target, [])]
+    while stack:
+        person, suffix = stack.pop()
+        if person == source:
+            yield suffix[::-1]
+            continue
+        for movie, parent in sorted(predecessors[person], reverse=True):
+            stack.append((parent, suffix + [(movie, person)]))
+
+
+def degrees_bounds(source, target):
+    """
+    Returns (lower, upper) bounds on the degrees of separation between
+    two people from the landmark index, without searching.
+
+    `upper` is None if no landmark reaches both people, and both are None
+    if the landmarks prove the people are not connected.
+    """
+    if landmarks is None:
+        raise ValueError("Distance estimates need the landmark index, see load_landmarks")
+    return landmarks.bounds(graph.person_index[source], graph.person_index[target])
+
+
+def reverse_path(source, path):
+    """
+    Returns the path from the target back to `source`, given a `path`
+    of (movie_id, person_id) pairs from `source` to the target.
+    """
+    people_on_path = [source] + [person_id for _, person_id in path]
+    return [
+        (path[i][0], people_on_path[i])
+        for i in range(len(path) - 1, -1, -1)
+    ]
+
+
+def _graph_path(source, target, search, stats):
+    """
+    Runs a search against the compact graph, translating
+    between IMDB ids and graph indices.
+    """
+    path = search(graph.person_index[source], graph.person_index[target], stats)
+    if path is None:
+        return None
+    return [(graph.movie_ids[movie], graph.person_ids[person]) for movie, person in path]
+
+
+def _steps(visited, person_id):
+    """
+    Returns the number of steps from `person_id` back to the root
+    of a bidirectional search tree.
+    """
+    steps = 0
+    while visited[person_id] is not None:
+        person_id = visited[person_id][1]
+        steps += 1
+    return steps
+
+
+def _join(forward, backward, meeting):
+    """
+    Joins the two halves of a bidirectional search at `meeting`
+    into a list of (movie_id, person_id) pairs from source to target.
+    """
+    path = []
+    person_id = meeting
+    while forward[person_id] is not None:
+        movie_id, parent = forward[person_id]
+        path.append((movie_id, person_id))
+        person_id = parent
+    path.reverse()
+
+    person_id = meeting
+    while backward[person_id] is not None:
+        movie_id, child = backward[person_id]
+        path.append((movie_id, child))
+        person_id = child
+    return path
+
+
+def person_id_for_name(name, interactive=True):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
+
+    Without `interactive`, ambiguities are resolved without asking:
+    the person with the most movies wins, then the earlier known birth
+    year, then the smaller id.
     """
+    if not interactive:
+        if name_index is not None:
+            return name_index.resolve(name)
+        person_ids = names.get(name.lower(), set())
+        if len(person_ids) == 0:
+            return None
+        return min(person_ids, key=lambda person_id: rank_key((
+            person_id, None, people[person_id]["birth"], len(people[person_id]["movies"]))))
+
     person_ids = list(names.get(name.lower(), set()))
     if len(person_ids) == 0:
         return None
@@ -171,6 +646,12 @@ def neighbors_for_person(person_id):
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    if graph is not None:
+        return {
+            (graph.movie_ids[movie], graph.person_ids[person])
+            for movie, person in graph.neighbors(graph.person_index[person_id])
+        }
+
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
@@ -0,0 +1,666 @@
+import csv
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import ChainMap, OrderedDict
+from collections.abc import Mapping, Sequence
+
+# Fields that follow the kind of every update record (see `Graph.apply`)
+RECORD_FIELDS = {
+    "person": ("id", "name", "birth"),
+    "movie": ("id", "title", "year"),
+    "star": ("person_id", "movie_id")
+}
+
+
+def check_records(records):
+    """
+    Returns update records as a list of tuples, or raises ValueError if
+    any of them is not a known kind followed by its string fields.
+    """
+    checked = []
+    for record in records:
+        if isinstance(record, (str, bytes)) or not isinstance(record, Sequence) or not record:
+            raise ValueError(f"Expected a record, got {record!r}")
+        kind, *values = record
+        if kind not in RECORD_FIELDS:
+            raise ValueError(f"Unknown record {kind!r}")
+        fields = RECORD_FIELDS[kind]
+        if len(values) != len(fields):
+            raise ValueError(f"Expected {kind} record with {', '.join(fields)}, got {record!r}")
+        if not all(isinstance(value, str) for value in values):
+            raise ValueError(f"Expected {kind} record fields to be strings, got {record!r}")
+        checked.append(tuple(record))
+    return checked
+
+
+class Graph():
+    """
+    Compact star graph of people and movies.
+
+    Person and movie IDs are interned to dense integers, and the
+    bipartite graph is stored twice in CSR form: for every person
+    the movies they starred in, and for every movie its stars.
+    Row `i` of a CSR table is `index[offsets[i]:offsets[i + 1]]`.
+
+    People, movies and star edges added after loading are kept in small
+    overlays next to the CSR tables (see `add_person`, `add_movie` and
+    `add_star`), so loaded and memory-mapped tables never change.
+    """
+
+    def __init__(self):
+        # Index -> IMDB id, and IMDB id -> index
+        self.person_ids = []
+        self.person_index = {}
+        self.movie_ids = []
+        self.movie_index = {}
+
+        # Per-person and per-movie attributes, by index
+        self.person_names = []
+        self.person_births = []
+        self.movie_titles = []
+        self.movie_years = []
+
+        # CSR tables: person -> movies and movie -> people
+        self.person_offsets = array("i", [0])
+        self.person_movies = array("i")
+        self.movie_offsets = array("i", [0])
+        self.movie_stars = array("i")
+
+        # Person indices sorted by lower-case name
+        self.name_order = array("i")
+
+        # Star edges added after loading: person -> movies, movie -> people
+        self.added_movies = {}
+        self.added_stars = {}
+
+        # Number of additions since the CSV files were parsed
+        self.revision = 0
+
+        # Optional `CoStarIndex` used by the searches
+        self.costars = None
+
+    @classmethod
+    def from_csv(cls, directory):
+        """
+        Load a graph from the people, movies and stars CSV files
+        in `directory`.
+        """
+        graph = cls()
+
+        with open(f"{directory}/people.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                graph.person_index[row["id"]] = len(graph.person_ids)
+                graph.person_ids.append(row["id"])
+                graph.person_names.append(row["name"])
+                graph.person_births.append(row["birth"])
+
+        with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                graph.movie_index[row["id"]] = len(graph.movie_ids)
+                graph.movie_ids.append(row["id"])
+                graph.movie_titles.append(row["title"])
+                graph.movie_years.append(row["year"])
+
+        # Edges as two parallel arrays, skipping unknown people and movies
+        edge_people = array("i")
+        edge_movies = array("i")
+        with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                person = graph.person_index.get(row["person_id"])
+                movie = graph.movie_index.get(row["movie_id"])
+                if person is None or movie is None:
+                    continue
+                edge_people.append(person)
+                edge_movies.append(movie)
+
+        graph.person_offsets, graph.person_movies = _csr(
+            len(graph.person_ids), edge_people, edge_movies)
+        graph.movie_offsets, graph.movie_stars = _csr(
+            len(graph.movie_ids), edge_movies, edge_people)
+        graph.name_order = array("i", sorted(
+            range(len(graph.person_names)), key=lambda i: graph.person_names[i].lower()))
+        return graph
+
+    def movies_of(self, person):
+        """
+        Returns the movie indices of `person`.
+        """
+        offsets = self.person_offsets
+        if person + 1 < len(offsets):
+            row = self.person_movies[offsets[person]:offsets[person + 1]]
+        else:
+            row = ()
+        added = self.added_movies.get(person)
+        return row if added is None else [*row, *added]
+
+    def stars_of(self, movie):
+        """
+        Returns the person indices of the stars of `movie`.
+        """
+        offsets = self.movie_offsets
+        if movie + 1 < len(offsets):
+            row = self.movie_stars[offsets[movie]:offsets[movie + 1]]
+        else:
+            row = ()
+        added = self.added_stars.get(movie)
+        return row if added is None else [*row, *added]
+
+    def add_person(self, person_id, name, birth):
+        """
+        Add a person and return their index. Known people are left as they are.
+        """
+        if person_id in self.person_index:
+            return self.person_index[person_id]
+        self._make_growable()
+        person = len(self.person_ids)
+        self.revision += 1
+        self.person_index[person_id] = person
+        self.person_ids.append(person_id)
+        self.person_names.append(name)
+        self.person_births.append(birth)
+        insort(self.name_order, person, key=lambda i: self.person_names[i].lower())
+        return person
+
+    def add_movie(self, movie_id, title, year):
+        """
+        Add a movie and return its index. Known movies are left as they are.
+        """
+        if movie_id in self.movie_index:
+            return self.movie_index[movie_id]
+        self._make_growable()
+        movie = len(self.movie_ids)
+        self.revision += 1
+        self.movie_index[movie_id] = movie
+        self.movie_ids.append(movie_id)
+        self.movie_titles.append(title)
+        self.movie_years.append(year)
+        return movie
+
+    def add_star(self, person, movie):
+        """
+        Add a star edge between two indices.
+        Returns False if the edge was already there.
+        """
+        if movie in self.movies_of(person):
+            return False
+        self.revision += 1
+        self.added_movies.setdefault(person, []).append(movie)
+        self.added_stars.setdefault(movie, []).append(person)
+        return True
+
+    def apply(self, records):
+        """
+        Add ("person", id, name, birth), ("movie", id, title, year) and
+        ("star", person_id, movie_id) records. Stars of unknown people or
+        movies are skipped, as when loading.
+
+        Every record is checked with `check_records` before any is
+        applied, so a bad batch leaves the graph unchanged.
+
+        Returns the new star edges as (person, movie) index pairs.
+        """
+        records = check_records(records)
+        edges = []
+        for kind, *values in records:
+            if kind == "person":
+                self.add_person(*values)
+            elif kind == "movie":
+                self.add_movie(*values)
+            elif kind == "star":
+                person = self.person_index.get(values[0])
+                movie = self.movie_index.get(values[1])
+                if person is not None and movie is not None and self.add_star(person, movie):
+                    edges.append((person, movie))
+        return edges
+
+    def updated(self):
+        """
+        Returns True if anything was added since loading.
+        """
+        return (len(self.person_offsets) != len(self.person_ids) + 1
+                or len(self.movie_offsets) != len(self.movie_ids) + 1
+                or bool(self.added_movies))
+
+    def _make_growable(self):
+        """
+        Wrap loaded tables that cannot be appended to (such as
+        memory-mapped ones) in overlays that can.
+        """
+        if isinstance(self.person_index, Mapping) and not isinstance(self.person_index, (dict, ChainMap)):
+            self.person_index = ChainMap({}, self.person_index)
+            self.movie_index = ChainMap({}, self.movie_index)
+            for name in ["person_ids", "person_names", "person_births",
+                         "movie_ids", "movie_titles", "movie_years"]:
+                setattr(self, name, _Extended(getattr(self, name)))
+        if not isinstance(self.name_order, array):
+            self.name_order = array("i", self.name_order)
+
+    def neighbors(self, person):
+        """
+        Returns (movie, person) index pairs for people
+        who starred with `person`.
+        """
+        neighbors = set()
+        for movie in self.movies_of(person):
+            for star in self.stars_of(movie):
+                neighbors.add((movie, star))
+        return neighbors
+
+    def shortest_path(self, source, target, stats=None):
+        """
+        Breadth-first search between two person indices.
+
+        Returns a list of (movie, person) index pairs, or None.
+        Metrics are counted into `stats` if given.
+        """
+        if source == target:
+            return []
+
+        expand = self._expander(stats)
+
+        # person -> (movie, parent person)
+        parents = {source: None}
+        frontier = [source]
+
+        while frontier:
+            next_frontier = []
+            for person in frontier:
+                for movie, star in expand(person):
+                    if star in parents:
+                        continue
+                    parents[star] = (movie, person)
+                    if star == target:
+                        return _unwind(parents, target)
+                    next_frontier.append(star)
+            frontier = next_frontier
+            if stats is not None:
+                stats.peak_frontier = max(stats.peak_frontier, len(frontier))
+
+        return None
+
+    def bidirectional_search(self, source, target, stats=None):
+        """
+        Bidirectional breadth-first search between two person indices,
+        always expanding one level of the smaller frontier.
+
+        Returns a list of (movie, person) index pairs, or None.
+        Metrics are counted into `stats` if given.
+        """
+        if source == target:
+            return []
+
+        forward = {source: None}
+        backward = {target: None}
+        forward_expand = self._expander(stats)
+        backward_expand = self._expander(stats)
+        forward_frontier = [source]
+        backward_frontier = [target]
+
+        while forward_frontier and backward_frontier:
+            if len(forward_frontier) <= len(backward_frontier):
+                frontier, visited, other, expand = (
+                    forward_frontier, forward, backward, forward_expand)
+            else:
+                frontier, visited, other, expand = (
+                    backward_frontier, backward, forward, backward_expand)
+
+            next_frontier = []
+            meeting = None
+            best = None
+            for person in frontier:
+                for movie, star in expand(person):
+                    if star in visited:
+                        continue
+                    visited[star] = (movie, person)
+                    next_frontier.append(star)
+                    if star in other:
+                        length = _depth(other, star)
+                        if best is None or length < best:
+                            meeting, best = star, length
+
+            if stats is not None:
+                waiting = backward_frontier if visited is forward else forward_frontier
+                stats.peak_frontier = max(stats.peak_frontier, len(next_frontier) + len(waiting))
+
+            if meeting is not None:
+                path = _unwind(forward, meeting)
+                person = meeting
+                while backward[person] is not None:
+                    movie, child = backward[person]
+                    path.append((movie, child))
+                    person = child
+                return path
+
+            if visited is forward:
+                forward_frontier = next_frontier
+            else:
+                backward_frontier = next_frontier
+
+        return None
+
+    def _expander(self, stats=None):
+        """
+        Returns a function that yields the (movie, person) steps out of
+        a person for one breadth-first search.
+
+        With a co-star index this is a scan over the person's deduplicated
+        co-stars. Otherwise every movie is expanded at most once per search,
+        since all of its stars are reached on the same level.
+        Only with `stats` are expansions counted.
+        """
+        if stats is not None:
+            expand = self._expander()
+
+            def counting(person):
+                steps = list(expand(person))
+                stats.expanded += 1
+                stats.neighbor_checks += len(steps)
+                return steps
+
+            return counting
+
+        if self.costars is not None:
+            row = self.costars.row
+            return lambda person: zip(*row(person))
+
+        seen_movies = set()
+
+        if not self.updated():
+            person_offsets, person_movies = self.person_offsets, self.person_movies
+            movie_offsets, movie_stars = self.movie_offsets, self.movie_stars
+
+            def expand(person):
+                for i in range(person_offsets[person], person_offsets[person + 1]):
+                    movie = person_movies[i]
+                    if movie in seen_movies:
+                        continue
+                    seen_movies.add(movie)
+                    for j in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                        yield movie, movie_stars[j]
+
+            return expand
+
+        # Slower path that also walks the overlays
+        movies_of, stars_of = self.movies_of, self.stars_of
+
+        def expand(person):
+            for movie in movies_of(person):
+                if movie in seen_movies:
+                    continue
+                seen_movies.add(movie)
+                for star in stars_of(movie):
+                    yield movie, star
+
+        return expand
+
+    @property
+    def people(self):
+        """
+        Read-only view of the graph shaped like `degrees.people`.
+        """
+        return _People(self)
+
+    @property
+    def movies(self):
+        """
+        Read-only view of the graph shaped like `degrees.movies`.
+        """
+        return _Movies(self)
+
+    @property
+    def names(self):
+        """
+        Read-only view of the graph shaped like `degrees.names`.
+        """
+        return _Names(self)
+
+
+class CoStarIndex():
+    """
+    Deduplicated co-star adjacency of a `Graph`: for every person the
+    people they starred with, each with one representative movie.
+
+    Rows are built all at once by `build`, or lazily on first use and
+    memoized. Lazy rows are evicted least recently used first once they
+    hold more than `max_entries` co-stars in total.
+    """
+
+    def __init__(self, graph, max_entries=None):
+        self.graph = graph
+        self.max_entries = max_entries
+
+        # Eager CSR table, set by `build`
+        self.offsets = None
+        self.movies = None
+        self.stars = None
+
+        # Lazy rows: person -> (movies, stars), in least recently used order
+        self.rows = OrderedDict()
+        self.entries = 0
+
+    def build(self):
+        """
+        Precompute the rows of every person into one CSR table.
+        """
+        offsets = array("i", [0])
+        movies = array("i")
+        stars = array("i")
+        for person in range(len(self.graph.person_ids)):
+            row_movies, row_stars = self._compute(person)
+            movies.extend(row_movies)
+            stars.extend(row_stars)
+            offsets.append(len(stars))
+        self.offsets, self.movies, self.stars = offsets, movies, stars
+        self.rows.clear()
+        self.entries = 0
+        return self
+
+    def row(self, person):
+        """
+        Returns (movies, stars) arrays: the co-stars of `person` and
+        one movie each of them starred in with `person`.
+        """
+        if self.offsets is not None:
+            # Rows of people changed since `build` are kept separately
+            if person in self.rows:
+                return self.rows[person]
+            if person + 1 >= len(self.offsets):
+                self.rows[person] = self._compute(person)
+                return self.rows[person]
+            start, end = self.offsets[person], self.offsets[person + 1]
+            return self.movies[start:end], self.stars[start:end]
+
+        row = self.rows.get(person)
+        if row is not None:
+            self.rows.move_to_end(person)
+            return row
+        row = self._compute(person)
+        self.rows[person] = row
+        self.entries += len(row[1])
+        while self.max_entries is not None and self.entries > self.max_entries and len(self.rows) > 1:
+            _, evicted = self.rows.popitem(last=False)
+            self.entries -= len(evicted[1])
+        return row
+
+    def invalidate(self, people):
+        """
+        Recompute the rows of `people` after star edges were added.
+        """
+        for person in people:
+            if self.offsets is not None:
+                self.rows[person] = self._compute(person)
+            elif person in self.rows:
+                self.entries -= len(self.rows.pop(person)[1])
+
+    def _compute(self, person):
+        graph = self.graph
+        costars = {}
+        for movie in graph.movies_of(person):
+            for star in graph.stars_of(movie):
+                if star != person and star not in costars:
+                    costars[star] = movie
+        return array("i", costars.values()), array("i", costars.keys())
+
+
+class _Extended(Sequence):
+    """
+    A read-only sequence with a list of appended items after it.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.added = []
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if i < len(self.base):
+            return self.base[i]
+        return self.added[i - len(self.base)]
+
+    def __len__(self):
+        return len(self.base) + len(self.added)
+
+    def append(self, item):
+        self.added.append(item)
+
+
+class _People(Mapping):
+    """
+    Maps person_ids to a dictionary of: name, birth, movies,
+    built on access from a `Graph`.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, person_id):
+        graph = self.graph
+        person = graph.person_index[person_id]
+        return {
+            "name": graph.person_names[person],
+            "birth": graph.person_births[person],
+            "movies": {graph.movie_ids[movie] for movie in graph.movies_of(person)}
+        }
+
+    def __contains__(self, person_id):
+        return person_id in self.graph.person_index
+
+    def __iter__(self):
+        return iter(self.graph.person_ids)
+
+    def __len__(self):
+        return len(self.graph.person_ids)
+
+
+class _Movies(Mapping):
+    """
+    Maps movie_ids to a dictionary of: title, year, stars,
+    built on access from a `Graph`.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, movie_id):
+        graph = self.graph
+        movie = graph.movie_index[movie_id]
+        return {
+            "title": graph.movie_titles[movie],
+            "year": graph.movie_years[movie],
+            "stars": {graph.person_ids[star] for star in graph.stars_of(movie)}
+        }
+
+    def __contains__(self, movie_id):
+        return movie_id in self.graph.movie_index
+
+    def __iter__(self):
+        return iter(self.graph.movie_ids)
+
+    def __len__(self):
+        return len(self.graph.movie_ids)
+
+
+class _Names(Mapping):
+    """
+    Maps lower-case names to a set of corresponding person_ids,
+    using binary search over the name order of a `Graph`.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def _range(self, name):
+        names, order = self.graph.person_names, self.graph.name_order
+        lo = bisect_left(order, name, key=lambda i: names[i].lower())
+        hi = bisect_right(order, name, lo=lo, key=lambda i: names[i].lower())
+        return lo, hi
+
+    def __getitem__(self, name):
+        lo, hi = self._range(name)
+        if lo == hi:
+            raise KeyError(name)
+        order, person_ids = self.graph.name_order, self.graph.person_ids
+        return {person_ids[order[i]] for i in range(lo, hi)}
+
+    def __contains__(self, name):
+        lo, hi = self._range(name)
+        return lo != hi
+
+    def __iter__(self):
+        previous = None
+        for person in self.graph.name_order:
+            name = self.graph.person_names[person].lower()
+            if name != previous:
+                yield name
+                previous = name
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+def _csr(rows, sources, targets):
+    """
+    Build CSR offset and index arrays with `rows` rows from
+    parallel arrays of edge sources and targets (a counting sort).
+    """
+    offsets = array("i", [0]) * (rows + 1)
+    for source in sources:
+        offsets[source + 1] += 1
+    for row in range(rows):
+        offsets[row + 1] += offsets[row]
+
+    index = array("i", [0]) * len(sources)
+    position = array("i", offsets[:-1])
+    for source, target in zip(sources, targets):
+        index[position[source]] = target
+        position[source] += 1
+    return offsets, index
+
+
+def _depth(parents, person):
+    """
+    Returns the number of steps from `person` back to the root
+    of a search tree.
+    """
+    depth = 0
+    while parents[person] is not None:
+        person = parents[person][1]
+        depth += 1
+    return depth
+
+
+def _unwind(parents, person):
+    """
+    Follow `parents` from `person` back to the root and return
+    the (movie, person) pairs in order from the root.
+    """
+    path = []
+    while parents[person] is not None:
+        movie, parent = parents[person]
+        path.append((movie, person))
+        person = parent
+    path.reverse()
+    return path
@@ -0,0 +1,288 @@
+import heapq
+import itertools
+import json
+import mmap
+import os
+import sys
+from array import array
+from collections import deque
+
+# Landmark index file written next to the CSV files
+FILENAME = "degrees.landmarks"
+
+MAGIC = b"DEGLMRK1"
+
+# Distance stored for people a landmark cannot reach. Real distances are
+# clamped below it, which keeps every bound derived from them valid.
+UNREACHABLE = 255
+
+
+class LandmarkIndex():
+    """
+    Breadth-first distances from a few landmark people to everyone
+    in a `Graph`, used for triangle-inequality distance bounds:
+
+        |d(L, s) - d(L, t)| <= d(s, t) <= d(L, s) + d(L, t)
+    """
+
+    def __init__(self, graph, landmarks, distances):
+        self.graph = graph
+
+        # Person indices of the landmarks
+        self.landmarks = landmarks
+
+        # One distance vector (bytes-like, one entry per person) per landmark
+        self.distances = distances
+
+    @classmethod
+    def build(cls, graph, count):
+        """
+        Pick `count` landmarks and compute their distance vectors.
+
+        The first landmark is the person with the most movies, and every
+        further one is the person farthest from all landmarks chosen so far
+        (among people they can reach), which spreads them over the graph.
+        """
+        people = len(graph.person_ids)
+        if people == 0:
+            return cls(graph, array("i"), [])
+        first = max(range(people), key=lambda person: (len(graph.movies_of(person)), -person))
+
+        landmarks = array("i", [first])
+        distances = [distances_from(graph, first)]
+        nearest = bytearray(distances[0])
+        while len(landmarks) < min(count, people):
+            farthest = max(
+                (person for person in range(people) if nearest[person] != UNREACHABLE),
+                key=lambda person: (nearest[person], -person))
+            if nearest[farthest] == 0:
+                break
+            landmarks.append(farthest)
+            distances.append(distances_from(graph, farthest))
+            nearest = bytearray(map(min, nearest, distances[-1]))
+        return cls(graph, landmarks, distances)
+
+    @classmethod
+    def load(cls, directory, graph, count, sources):
+        """
+        Returns the landmark index stored in `directory` if it was built
+        with `count` landmarks for `sources` and the same graph revision,
+        otherwise builds and saves one.
+        """
+        path = os.path.join(directory, FILENAME)
+        index = cls.read(path, graph, count, sources)
+        if index is None:
+            index = cls.build(graph, count)
+            index.write(path, sources)
+        return index
+
+    def write(self, path, sources):
+        """
+        Save the index to `path`: the magic bytes, an 8-byte header length,
+        a JSON header with the landmarks, then one distance vector per landmark.
+        """
+        header = json.dumps({
+            "byteorder": sys.byteorder,
+            "sources": sources,
+            "people": len(self.graph.person_ids),
+            "revision": self.graph.revision,
+            "landmarks": list(self.landmarks)
+        }).encode("utf-8")
+
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(MAGIC)
+            f.write(len(header).to_bytes(8, "little"))
+            f.write(header)
+            for distances in self.distances:
+                f.write(distances)
+        os.replace(temporary, path)
+
+    @classmethod
+    def read(cls, path, graph, count, sources):
+        """
+        Memory-map the index at `path`, or return None if it is missing
+        or was built for other data or another number of landmarks.
+        """
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        with f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            length = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(length))
+            people = len(graph.person_ids)
+            if (header["sources"] != sources or header["people"] != people
+                    or header.get("revision") != graph.revision
+                    or len(header["landmarks"]) != count):
+                return None
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        view = memoryview(buffer)
+        start = len(MAGIC) + 8 + length
+        distances = [
+            view[start + i * people:start + (i + 1) * people]
+            for i in range(len(header["landmarks"]))
+        ]
+        return cls(graph, array("i", header["landmarks"]), distances)
+
+    def update(self, edges):
+        """
+        Bring the distance vectors up to date after (person, movie) star
+        edges were added. New edges only ever shorten distances, so only
+        the people whose distance drops are visited.
+        """
+        people = len(self.graph.person_ids)
+        for k, distances in enumerate(self.distances):
+            if not isinstance(distances, bytearray):
+                distances = self.distances[k] = bytearray(distances)
+            distances.extend(bytes([UNREACHABLE]) * (people - len(distances)))
+
+            changed = []
+            for _, movie in edges:
+                stars = self.graph.stars_of(movie)
+                nearest = min(distances[star] for star in stars)
+                if nearest == UNREACHABLE:
+                    continue
+                for star in stars:
+                    if distances[star] > nearest + 1:
+                        distances[star] = min(nearest + 1, UNREACHABLE - 1)
+                        changed.append(star)
+            _relax(self.graph, distances, changed)
+
+    def bounds(self, source, target):
+        """
+        Returns (lower, upper) bounds on the number of degrees between two
+        person indices. `upper` is None when no landmark reaches both, and
+        `lower` is None when the landmarks prove they are not connected.
+        """
+        lower = 0
+        upper = None
+        for distances in self.distances:
+            a, b = distances[source], distances[target]
+            if a == UNREACHABLE and b == UNREACHABLE:
+                continue
+            if a == UNREACHABLE or b == UNREACHABLE:
+                return None, None
+            lower = max(lower, abs(a - b))
+            if upper is None or a + b < upper:
+                upper = a + b
+        return lower, upper
+
+    def shortest_path(self, source, target, stats=None):
+        """
+        Goal-directed (A*) search between two person indices, using the
+        landmark lower bound as an admissible and consistent heuristic.
+
+        Returns a list of (movie, person) index pairs, or None.
+        Metrics are counted into `stats` if given.
+        """
+        if source == target:
+            return []
+
+        graph = self.graph
+        movies_of, stars_of = graph.movies_of, graph.stars_of
+        target_distances = [(distances, distances[target]) for distances in self.distances]
+
+        def heuristic(person):
+            bound = 0
+            for distances, to_target in target_distances:
+                d = distances[person]
+                if (d == UNREACHABLE) != (to_target == UNREACHABLE):
+                    return None
+                if abs(d - to_target) > bound:
+                    bound = abs(d - to_target)
+            return bound
+
+        if heuristic(source) is None:
+            return None
+
+        # person -> (movie, parent person), and best known costs
+        parents = {source: None}
+        costs = {source: 0}
+        # Lowest cost a movie has been expanded with
+        movie_costs = {}
+        closed = set()
+        counter = itertools.count()
+        frontier = [(heuristic(source), next(counter), source)]
+
+        while frontier:
+            _, _, person = heapq.heappop(frontier)
+            if person in closed:
+                continue
+            if person == target:
+                path = []
+                while parents[person] is not None:
+                    movie, parent = parents[person]
+                    path.append((movie, person))
+                    person = parent
+                path.reverse()
+                return path
+            closed.add(person)
+            if stats is not None:
+                stats.expanded += 1
+                stats.peak_frontier = max(stats.peak_frontier, len(frontier) + 1)
+
+            cost = costs[person] + 1
+            for movie in movies_of(person):
+                if movie_costs.get(movie, cost + 1) <= cost:
+                    continue
+                movie_costs[movie] = cost
+                stars = stars_of(movie)
+                if stats is not None:
+                    stats.neighbor_checks += len(stars)
+                for star in stars:
+                    if star in closed or costs.get(star, cost + 1) <= cost:
+                        continue
+                    estimate = heuristic(star)
+                    if estimate is None:
+                        continue
+                    costs[star] = cost
+                    parents[star] = (movie, person)
+                    heapq.heappush(frontier, (cost + estimate, next(counter), star))
+
+        return None
+
+
+def _relax(graph, distances, changed):
+    """
+    Spread shortened distances from the people in `changed` breadth first,
+    until no distance drops any more.
+    """
+    queue = deque(changed)
+    while queue:
+        person = queue.popleft()
+        depth = min(distances[person] + 1, UNREACHABLE - 1)
+        for movie in graph.movies_of(person):
+            for star in graph.stars_of(movie):
+                if distances[star] > depth:
+                    distances[star] = depth
+                    queue.append(star)
+
+
+def distances_from(graph, source):
+    """
+    Returns a bytearray of breadth-first distances from `source` to every
+    person in `graph`, clamped below UNREACHABLE.
+    """
+    distances = bytearray([UNREACHABLE]) * len(graph.person_ids)
+    distances[source] = 0
+    seen_movies = set()
+    frontier = [source]
+    depth = 0
+    while frontier:
+        depth = min(depth + 1, UNREACHABLE - 1)
+        next_frontier = []
+        for person in frontier:
+            for movie in graph.movies_of(person):
+                if movie in seen_movies:
+                    continue
+                seen_movies.add(movie)
+                for star in graph.stars_of(movie):
+                    if distances[star] == UNREACHABLE:
+                        distances[star] = depth
+                        next_frontier.append(star)
+        frontier = next_frontier
+    return distances
@@ -0,0 +1,356 @@
+import heapq
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from math import ceil
+
+# Prefixes up to this length have their best candidates precomputed
+TOP_PREFIX = 4
+TOP_K = 10
+
+# Trigram posting lists keep at most this many names, those of the best
+# ranked people, so common trigrams like "son" cannot flood a fuzzy lookup
+MAX_POSTING = 1024
+
+# Candidates of a fuzzy lookup whose similarity is computed in full
+MAX_CANDIDATES = 32
+
+# People added or re-counted since the rank tree was built are scanned
+# by every prefix lookup, until there are this many and it is rebuilt
+MAX_OVERFLOW = 4096
+
+
+class NameIndex():
+    """
+    Non-interactive name resolution over all people.
+
+    Entries are stored in the order they were added, with `order` holding
+    their positions sorted by lower-case name for exact and prefix lookups.
+    Every candidate list is ranked by `rank_key`: more movies first,
+    then the earlier known birth year, then the smaller id. The top
+    candidates of every short prefix are precomputed, longer prefixes are
+    answered by a `RankTree` over `order`, and a trigram index for fuzzy
+    lookups is built by `build_trigrams`, or on first use.
+    """
+
+    def __init__(self, entries):
+        """
+        Build the index from (person_id, name, birth, movie count) tuples.
+        """
+        entries = sorted(entries, key=lambda entry: (entry[1].lower(), rank_key(entry)))
+        self.keys = [name.lower() for _, name, _, _ in entries]
+        self.person_ids = [person_id for person_id, _, _, _ in entries]
+        self.births = [birth for _, _, birth, _ in entries]
+        self.movie_counts = array("i", (count for _, _, _, count in entries))
+        self.order = array("i", range(len(entries)))
+
+        # The best few entries for each short prefix
+        self.top = {}
+        ranked = sorted(range(len(entries)), key=self._rank)
+        for i in ranked:
+            key = self.keys[i]
+            for length in range(1, min(len(key), TOP_PREFIX) + 1):
+                candidates = self.top.setdefault(key[:length], [])
+                if len(candidates) < TOP_K:
+                    candidates.append(i)
+        self._build_ranks(ranked)
+
+        # Trigram -> one entry position for each of the best MAX_POSTING
+        # distinct names with it, the number of distinct names with it,
+        # and the names indexed, built by `build_trigrams`
+        self.trigrams = None
+        self.trigram_counts = None
+        self.trigram_keys = None
+
+    def build_trigrams(self):
+        """
+        Build the trigram index for `fuzzy`. Every distinct name is
+        indexed once, by its best ranked entry, and names are offered to
+        the posting lists best ranked first, so a full list holds the
+        names of the people with the most movies.
+        """
+        self.trigrams = {}
+        self.trigram_counts = Counter()
+        self.trigram_keys = set()
+        for i in sorted(range(len(self.keys)), key=self._rank):
+            self._post(i)
+
+    def exact(self, name):
+        """
+        Returns the person_ids with exactly `name` (ignoring case), best first.
+        """
+        return [self.person_ids[i] for i in self._exact(name.lower())]
+
+    def prefix(self, prefix, k=TOP_K):
+        """
+        Returns the `k` best person_ids whose name starts with `prefix`.
+
+        Takes O(k log n) steps however many names start with `prefix`,
+        plus a scan of the people added or re-counted since the rank
+        tree was last built.
+        """
+        key = prefix.lower()
+        if len(key) <= TOP_PREFIX and k <= TOP_K and key:
+            return [self.person_ids[i] for i in self.top.get(key, [])[:k]]
+
+        # Entries in the tree keep their rank at build time, so the tree's
+        # best are merged with the changed entries by their current rank
+        lo = bisect_left(self.tree_order, key, key=self.keys.__getitem__)
+        hi = bisect_left(self.tree_order, key + chr(0x10FFFF), lo, key=self.keys.__getitem__)
+        found = self.ranks.best(lo, hi, k)
+        found.extend(i for i in self.overflow if self.keys[i].startswith(key))
+        best = heapq.nsmallest(k, found, key=self._rank)
+        return [self.person_ids[i] for i in best]
+
+    def fuzzy(self, name, k=TOP_K, threshold=0.5):
+        """
+        Returns up to `k` person_ids whose name shares at least `threshold`
+        of the trigrams of `name`, best matches first.
+
+        Only the rarest trigrams are scanned for candidate names, since a
+        name that shares enough trigrams must share one of them, and the
+        MAX_CANDIDATES that share the most of those are scored. As posting
+        lists are capped, names made of very common trigrams only whose
+        people have few movies can be missed, but a lookup never scans
+        more than a few posting lists of MAX_POSTING entries.
+        """
+        if self.trigrams is None:
+            self.build_trigrams()
+
+        grams = set(_trigrams(name.lower()))
+        if not grams:
+            return []
+        needed = max(1, ceil(threshold * len(grams)))
+        rarest = sorted(grams, key=self.trigram_counts.__getitem__)
+
+        shared = Counter()
+        for trigram in rarest[:len(grams) - needed + 1]:
+            shared.update(self.trigrams.get(trigram, ()))
+
+        scored = []
+        for i, _ in shared.most_common(MAX_CANDIDATES):
+            other = set(_trigrams(self.keys[i]))
+            count = len(grams & other)
+            if count >= needed:
+                similarity = count / (len(grams) + len(other) - count)
+                scored.append((-similarity, self._rank(i), i))
+
+        # The best `k` people all have one of the best `k` names
+        best = [
+            (similarity, self._rank(j), j)
+            for similarity, _, i in heapq.nsmallest(k, scored)
+            for j in self._exact(self.keys[i])
+        ]
+        return [self.person_ids[j] for _, _, j in heapq.nsmallest(k, best)]
+
+    def candidates(self, name, k=TOP_K):
+        """
+        Returns up to `k` person_ids for `name`: exact matches if there
+        are any, otherwise prefix matches, otherwise fuzzy matches.
+        """
+        return self.exact(name)[:k] or self.prefix(name, k) or self.fuzzy(name, k)
+
+    def resolve(self, name):
+        """
+        Returns the one person_id `name` refers to, or None.
+
+        Ambiguous names resolve to the best ranked exact match, so the
+        same data always gives the same answer.
+        """
+        found = self.exact(name)
+        return found[0] if found else None
+
+    def add(self, person_id, name, birth, count=0):
+        """
+        Add a person to the index.
+        """
+        i = len(self.keys)
+        key = name.lower()
+        self.keys.append(key)
+        self.person_ids.append(person_id)
+        self.births.append(birth)
+        self.movie_counts.append(count)
+        insort(self.order, i, key=self.keys.__getitem__)
+        self._offer(i)
+        self._changed(i)
+
+        # New people have few movies, so they only go into lists with room
+        if self.trigrams is not None:
+            self._post(i)
+
+    def update_count(self, person_id, name, count):
+        """
+        Set the number of movies of a person already in the index.
+        """
+        for i in self._exact(name.lower()):
+            if self.person_ids[i] == person_id:
+                self.movie_counts[i] = count
+                self._offer(i)
+                self.ranks.remove(i)
+                self._changed(i)
+                return
+
+    def _exact(self, key):
+        """
+        Returns the positions of the entries named `key`, best first.
+        """
+        lo = bisect_left(self.order, key, key=self.keys.__getitem__)
+        hi = lo
+        while hi < len(self.order) and self.keys[self.order[hi]] == key:
+            hi += 1
+        return sorted((self.order[j] for j in range(lo, hi)), key=self._rank)
+
+    def _offer(self, i):
+        """
+        Let entry `i` into the precomputed top lists it now ranks for.
+        """
+        key = self.keys[i]
+        for length in range(1, min(len(key), TOP_PREFIX) + 1):
+            candidates = self.top.setdefault(key[:length], [])
+            if i not in candidates:
+                candidates.append(i)
+            candidates.sort(key=self._rank)
+            del candidates[TOP_K:]
+
+    def _changed(self, i):
+        """
+        Have prefix lookups scan entry `i`, whose rank in the tree is
+        missing or out of date, rebuilding the tree once too many are.
+        """
+        self.overflow.add(i)
+        if len(self.overflow) > MAX_OVERFLOW:
+            self._build_ranks(sorted(range(len(self.keys)), key=self._rank))
+
+    def _build_ranks(self, ranked):
+        """
+        Build the rank tree over the current `order` from all entry
+        positions sorted by `_rank`.
+        """
+        self.tree_order = array("i", self.order)
+        self.ranks = RankTree(self.tree_order, ranked)
+        self.overflow = set()
+
+    def _post(self, i):
+        """
+        Index the name of entry `i` under its trigrams, unless it already
+        is, adding it to the posting lists that have room.
+        """
+        key = self.keys[i]
+        if key in self.trigram_keys:
+            return
+        self.trigram_keys.add(key)
+        for trigram in set(_trigrams(key)):
+            self.trigram_counts[trigram] += 1
+            posting = self.trigrams.setdefault(trigram, array("i"))
+            if len(posting) < MAX_POSTING:
+                posting.append(i)
+
+    def _rank(self, i):
+        return rank_key((self.person_ids[i], self.keys[i], self.births[i], self.movie_counts[i]))
+
+
+class RankTree():
+    """
+    Segment tree over a sequence of entry positions that finds the best
+    ranked entries in any range of it without scanning the range.
+
+    Every leaf holds the rank of its entry, its index in `ranked`, and
+    every inner node the best rank below it, so the best entry in a range
+    takes O(log n) steps, and the `k` best take O(k log n).
+    """
+
+    def __init__(self, positions, ranked):
+        """
+        Build the tree over `positions`, ranking them by their index in
+        `ranked`, a permutation of all entry positions.
+        """
+        self.ranked = array("i", ranked)
+        self.missing = len(ranked)
+        self.where = array("i", bytes(4 * len(ranked)))
+        for j, i in enumerate(positions):
+            self.where[i] = j
+
+        rank = array("i", bytes(4 * len(ranked)))
+        for r, i in enumerate(ranked):
+            rank[i] = r
+        self.size = 1
+        while self.size < len(positions):
+            self.size *= 2
+        self.tree = array("i", [self.missing]) * (2 * self.size)
+        for j, i in enumerate(positions):
+            self.tree[self.size + j] = rank[i]
+        for node in range(self.size - 1, 0, -1):
+            self.tree[node] = min(self.tree[2 * node], self.tree[2 * node + 1])
+
+    def best(self, lo, hi, k):
+        """
+        Returns the `k` best ranked entry positions in `positions[lo:hi]`,
+        best first.
+
+        The best entry of the range splits it in two, and the best of
+        those ranges are kept in a heap, so each of the `k` entries costs
+        two range queries.
+        """
+        found = []
+        heap = [(self._query(lo, hi), lo, hi)]
+        while heap and len(found) < k:
+            rank, lo, hi = heapq.heappop(heap)
+            if rank == self.missing:
+                break
+            i = self.ranked[rank]
+            found.append(i)
+            j = self.where[i]
+            if lo < j:
+                heapq.heappush(heap, (self._query(lo, j), lo, j))
+            if j + 1 < hi:
+                heapq.heappush(heap, (self._query(j + 1, hi), j + 1, hi))
+        return found
+
+    def remove(self, i):
+        """
+        Leave entry position `i` out of all later results.
+        """
+        # Entries added after the tree was built are not in it
+        if i >= len(self.where):
+            return
+        node = self.size + self.where[i]
+        self.tree[node] = self.missing
+        node //= 2
+        while node:
+            self.tree[node] = min(self.tree[2 * node], self.tree[2 * node + 1])
+            node //= 2
+
+    def _query(self, lo, hi):
+        """
+        Returns the best rank in `positions[lo:hi]`, or `missing` if none.
+        """
+        best = self.missing
+        lo += self.size
+        hi += self.size
+        while lo < hi:
+            if lo & 1:
+                best = min(best, self.tree[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                best = min(best, self.tree[hi])
+            lo //= 2
+            hi //= 2
+        return best
+
+
+def rank_key(entry):
+    """
+    Sort key of a (person_id, name, birth, movie count) tuple: more movies
+    first, then the earlier known birth year, then the smaller id.
+    """
+    person_id, _, birth, count = entry
+    return (-count, birth == "", birth, len(person_id), person_id)
+
+
+def _trigrams(key):
+    """
+    Returns the trigrams of `key`, padded so word starts count too.
+    """
+    padded = f"  {key} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
@@ -0,0 +1,306 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import batch
+import degrees
+from util import LRUCache
+
+
+class Server():
+    """
+    Answers degrees-of-separation queries over HTTP from a graph that
+    stays in memory. Searches run in a process pool, or on threads with a
+    single worker, so the event loop stays responsive, and paths are kept
+    in an LRU cache keyed on the unordered (source, target) pair.
+
+        GET /path?source=...&target=...   shortest path, names or IDs
+        GET /person?name=...&match=...&k=...
+                                          people by exact, prefix or fuzzy name
+        GET /stats                        cache counters
+        POST /update                      add {"records": [...]}, see
+                                          `degrees.update_data`
+    """
+
+    def __init__(self, workers, cache_size, data):
+        self.cache = LRUCache(cache_size)
+        self.workers = workers
+        self.data = data
+
+        # Searches in flight, so concurrent identical queries share one search
+        self.pending = {}
+
+        # Bumped by every update, so searches that started before one
+        # are not cached
+        self.generation = 0
+
+        # Records applied since loading, replayed by workers that load
+        # the data themselves
+        self.records = []
+        self.pool = self._pool()
+
+        # Name lookups, searches without a pool and updates all run on
+        # threads, and updates wait for the others to finish
+        self.lock = threading.Lock()
+
+    def _pool(self):
+        if self.workers <= 1:
+            return None
+        if multiprocessing.get_start_method() == "fork":
+            return ProcessPoolExecutor(self.workers)
+        return ProcessPoolExecutor(self.workers, initializer=batch._reload,
+                                   initargs=(self.data, self.records))
+
+    async def shortest_path(self, source, target):
+        """
+        Returns `shortest_path` between two person_ids, from the cache
+        when possible.
+        """
+        key = frozenset((source, target))
+        entry = self.cache.get(key)
+        if entry is None:
+            generation = self.generation
+            if key not in self.pending:
+                self.pending[key] = asyncio.ensure_future(self._search(source, target))
+            future = self.pending[key]
+            try:
+                entry = await future
+            finally:
+                if self.pending.get(key) is future:
+                    del self.pending[key]
+            if generation == self.generation:
+                self.cache.put(key, entry)
+
+        # Paths are symmetric: turn the cached one around if needed
+        cached_source, path = entry
+        if path is None or cached_source == source:
+            return path
+        return degrees.reverse_path(cached_source, path)
+
+    async def _search(self, source, target):
+        loop = asyncio.get_running_loop()
+        if self.pool is None:
+            path = await loop.run_in_executor(None, self._find_path, source, target)
+        else:
+            path = await loop.run_in_executor(self.pool, batch.find_path, source, target)
+        return source, path
+
+    def _find_path(self, source, target):
+        """
+        Search in this process, on a thread, while no update runs.
+        """
+        with self.lock:
+            return batch.find_path(source, target)
+
+    async def update(self, records):
+        """
+        Add `records` to the loaded data, drop the cached paths they may
+        have shortened and restart the workers on the updated graph.
+        The data is updated on a thread, so other requests are still read
+        and answered from the cache meanwhile.
+        """
+        loop = asyncio.get_running_loop()
+        edges = await loop.run_in_executor(None, self._apply, records)
+        self.generation += 1
+        self.pending.clear()
+        dropped = self.cache.invalidate(lambda key, entry: degrees.path_is_stale(
+            entry[0], next(iter(key - {entry[0]}), entry[0]), entry[1], edges))
+
+        # Forked workers hold a copy of the old graph, others load it
+        # again and replay every update since
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+            self.pool = self._pool()
+        return {"edges": len(edges), "invalidated": dropped}
+
+    def _apply(self, records):
+        """
+        Returns the new edges of `records` after applying them, on a
+        thread, once no lookup or search in this process is running.
+        """
+        directory = self.data[0] if self.data[2] else None
+        with self.lock:
+            edges = degrees.update_data(records, directory)
+            self.records.extend(records)
+        return edges
+
+    async def handle(self, reader, writer):
+        """
+        Serve one HTTP request and close the connection.
+        """
+        try:
+            request = await reader.readline()
+            length = 0
+            bad_header = False
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                name, _, value = line.decode("latin-1").partition(":")
+                if name.strip().lower() == "content-length":
+                    try:
+                        length = int(value)
+                    except ValueError:
+                        bad_header = True
+                    if length < 0:
+                        bad_header = True
+            content = await reader.readexactly(length) if length > 0 else b""
+            try:
+                method, target, _ = request.decode("latin-1").split(" ", 2)
+            except ValueError:
+                bad_header = True
+            if bad_header:
+                status, body = 400, {"error": "Bad request."}
+            else:
+                try:
+                    if method == "POST" and urlsplit(target).path == "/update":
+                        status, body = await self.route_update(content)
+                    elif method != "GET":
+                        status, body = 405, {"error": "Only GET is supported."}
+                    else:
+                        status, body = await self.route(target)
+                except Exception as e:
+                    print(f"Error serving {target}: {e!r}", file=sys.stderr)
+                    status, body = 500, {"error": "Internal server error."}
+            self.respond(writer, status, body)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            # The client went away before the request was complete
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, target):
+        """
+        Returns the (status, body) answer for a request target.
+        """
+        url = urlsplit(target)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        if url.path == "/path":
+            if "source" not in query or "target" not in query:
+                return 400, {"error": "Expected source and target."}
+            try:
+                source = batch.resolve(query["source"])
+                target = batch.resolve(query["target"])
+            except LookupError as e:
+                return 404, {"error": str(e)}
+            path = await self.shortest_path(source, target)
+            return 200, {
+                "source_id": source,
+                "target_id": target,
+                "degrees": None if path is None else len(path),
+                "path": path
+            }
+
+        if url.path == "/person":
+            if "name" not in query:
+                return 400, {"error": "Expected name."}
+            match = query.get("match", "exact")
+            if match not in ("exact", "prefix", "fuzzy", "any"):
+                return 400, {"error": "Expected match to be exact, prefix, fuzzy or any."}
+            try:
+                k = int(query.get("k", 10))
+            except ValueError:
+                return 400, {"error": "Expected k to be a number."}
+            loop = asyncio.get_running_loop()
+            return 200, await loop.run_in_executor(None, self.find_people, query["name"], match, k)
+
+        if url.path == "/stats":
+            return 200, self.cache.stats()
+
+        return 404, {"error": "Not found."}
+
+    def find_people(self, name, match, k):
+        """
+        Returns up to `k` people matching `name`, as dictionaries with
+        their id, name and birth. Run on a thread, off the event loop.
+        """
+        with self.lock:
+            index = degrees.name_index
+            if match == "exact":
+                person_ids = index.exact(name)[:k]
+            elif match == "any":
+                person_ids = index.candidates(name, k)
+            else:
+                person_ids = getattr(index, match)(name, k)
+            return [
+                {
+                    "id": person_id,
+                    "name": degrees.people[person_id]["name"],
+                    "birth": degrees.people[person_id]["birth"]
+                }
+                for person_id in person_ids
+            ]
+
+    async def route_update(self, content):
+        """
+        Returns the (status, body) answer for a POST /update body.
+        """
+        try:
+            records = json.loads(content)["records"]
+            return 200, await self.update(records)
+        except (ValueError, KeyError, TypeError, IndexError) as e:
+            return 400, {"error": f"Bad update: {e}"}
+
+    def respond(self, writer, status, body):
+        reasons = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                   500: "Internal Server Error"}
+        data = json.dumps(body).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {reasons[status]}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: close\r\n\r\n".encode("latin-1") + data)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+
+async def serve(server, host, port):
+    listener = await asyncio.start_server(server.handle, host, port)
+    print(f"Serving on http://{host}:{port}", file=sys.stderr)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        usage="python server.py [directory] [--host HOST] [--port PORT] [--workers N] [--cache-size N]",
+        description="Serve degrees-of-separation queries over HTTP.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8050)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--cache-size", type=int, default=10000)
+    parser.add_argument("--compact", action="store_true",
+                        help="load the star graph into compact integer arrays")
+    parser.add_argument("--cache", action="store_true",
+                        help="load the compact graph from a binary snapshot")
+    parser.add_argument("--landmarks", type=int, metavar="K",
+                        help="search with a K-landmark distance index (implies --compact)")
+    parser.add_argument("--costars", action="store_true",
+                        help="search over a precomputed co-star index (implies --compact)")
+    args = parser.parse_args()
+
+    data = (args.directory, args.compact or bool(args.landmarks) or args.costars,
+            args.cache, args.landmarks, args.costars)
+    print("Loading data...", file=sys.stderr)
+    batch._load(*data)
+    print("Data loaded.", file=sys.stderr)
+
+    server = Server(args.workers, args.cache_size, data)
+    try:
+        asyncio.run(serve(server, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+import json
+import mmap
+import os
+import sys
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+
+from graph import Graph, check_records
+
+# Snapshot file written next to the CSV files
+FILENAME = "degrees.snapshot"
+
+MAGIC = b"DEGSNAP1"
+
+# CSV files whose mtime and size decide whether a snapshot is current
+SOURCES = ["people.csv", "movies.csv", "stars.csv"]
+
+
+def load(directory):
+    """
+    Return a `Graph` for `directory`, memory-mapped from its snapshot
+    when the snapshot is current, otherwise parsed from the CSV files
+    and written to a fresh snapshot.
+    """
+    path = os.path.join(directory, FILENAME)
+    sources = source_stats(directory)
+    graph = read(path, sources)
+    if graph is None:
+        graph = Graph.from_csv(directory)
+        write(graph, path, sources)
+    return graph
+
+
+def append(directory, records):
+    """
+    Append update records (see `Graph.apply`) to the snapshot in
+    `directory`, so later loads replay them after the mapped sections.
+
+    Returns False, leaving the file alone, if there is no current snapshot.
+    """
+    path = os.path.join(directory, FILENAME)
+    try:
+        f = open(path, "r+b")
+    except FileNotFoundError:
+        return False
+    with f:
+        if f.read(len(MAGIC)) != MAGIC:
+            return False
+        length = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(length))
+        if header["sources"] != source_stats(directory) or header["byteorder"] != sys.byteorder:
+            return False
+
+        # Drop a torn last line left by an append that did not finish
+        end = _records_start(header, length)
+        f.seek(end)
+        appended = f.read()
+        if appended and not appended.endswith(b"\n"):
+            f.truncate(end + appended.rfind(b"\n") + 1)
+        f.seek(0, os.SEEK_END)
+        f.write(b"".join(json.dumps(list(record)).encode("utf-8") + b"\n" for record in records))
+    return True
+
+
+def source_stats(directory):
+    """
+    Returns the mtime and size of each CSV file in `directory`.
+    """
+    stats = {}
+    for filename in SOURCES:
+        stat = os.stat(os.path.join(directory, filename))
+        stats[filename] = [stat.st_mtime_ns, stat.st_size]
+    return stats
+
+
+def write(graph, path, sources):
+    """
+    Write `graph` to a snapshot file at `path`, recording `sources`
+    for invalidation.
+
+    The file is the magic bytes, an 8-byte header length, a JSON header
+    and 8-byte aligned sections, one per array or string table, followed
+    by any records added with `append`, one JSON list per line.
+    """
+    sections = {
+        "person_offsets": array("i", graph.person_offsets),
+        "person_movies": array("i", graph.person_movies),
+        "movie_offsets": array("i", graph.movie_offsets),
+        "movie_stars": array("i", graph.movie_stars),
+        "name_order": array("i", graph.name_order),
+        "person_id_order": array("i", sorted(
+            range(len(graph.person_ids)), key=lambda i: graph.person_ids[i])),
+        "movie_id_order": array("i", sorted(
+            range(len(graph.movie_ids)), key=lambda i: graph.movie_ids[i])),
+    }
+    for name in ["person_ids", "person_names", "person_births",
+                 "movie_ids", "movie_titles", "movie_years"]:
+        offsets, blob = _pack_strings(getattr(graph, name))
+        sections[f"{name}.offsets"] = offsets
+        sections[f"{name}.blob"] = blob
+
+    # Lay the sections out after the header
+    layout = {}
+    position = 0
+    for name, data in sections.items():
+        size = len(data) * data.itemsize if isinstance(data, array) else len(data)
+        typecode = data.typecode if isinstance(data, array) else "B"
+        layout[name] = [position, size, typecode]
+        position = _align(position + size)
+
+    header = json.dumps({
+        "byteorder": sys.byteorder,
+        "sources": sources,
+        "sections": layout
+    }).encode("utf-8")
+    start = _align(len(MAGIC) + 8 + len(header))
+
+    # Write to a temporary file first so readers never see a partial snapshot
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        for name, data in sections.items():
+            f.seek(start + layout[name][0])
+            f.write(data)
+        f.truncate(start + position)
+    os.replace(temporary, path)
+
+
+def read(path, sources):
+    """
+    Memory-map the snapshot at `path` as a `Graph`.
+
+    Returns None if there is no snapshot, or if it was written
+    for different `sources` or on a machine of another byte order.
+    Records appended after the sections are applied to the graph.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    with f:
+        if f.read(len(MAGIC)) != MAGIC:
+            return None
+        length = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(length))
+        if header["sources"] != sources or header["byteorder"] != sys.byteorder:
+            return None
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    start = _align(len(MAGIC) + 8 + length)
+    view = memoryview(buffer)
+    sections = {}
+    for name, (offset, size, typecode) in header["sections"].items():
+        sections[name] = view[start + offset:start + offset + size].cast(typecode)
+
+    graph = Graph()
+    for name in ["person_offsets", "person_movies", "movie_offsets",
+                 "movie_stars", "name_order"]:
+        setattr(graph, name, sections[name])
+    for name in ["person_ids", "person_names", "person_births",
+                 "movie_ids", "movie_titles", "movie_years"]:
+        setattr(graph, name, _Strings(sections[f"{name}.offsets"], sections[f"{name}.blob"]))
+    graph.person_index = _Index(graph.person_ids, sections["person_id_order"])
+    graph.movie_index = _Index(graph.movie_ids, sections["movie_id_order"])
+
+    end = _records_start(header, length)
+    if end < len(buffer):
+        graph.apply(_read_records(bytes(view[end:])))
+    return graph
+
+
+def _read_records(data):
+    """
+    Returns the update records appended after the sections. A process
+    that died while appending can leave a torn last line, so reading
+    stops at the first line that is not a complete, valid record.
+    """
+    records = []
+    for line in data.split(b"\n")[:-1]:
+        try:
+            records.extend(check_records([json.loads(line)]))
+        except ValueError:
+            break
+    return records
+
+
+def _records_start(header, length):
+    """
+    Returns the position in a snapshot file where appended records start,
+    after the sections described by `header`, a JSON header of `length` bytes.
+    """
+    start = _align(len(MAGIC) + 8 + length)
+    return start + max((_align(offset + size) for offset, size, _ in header["sections"].values()),
+                       default=0)
+
+
+class _Strings(Sequence):
+    """
+    Sequence of strings decoded on access from a UTF-8 blob,
+    where string `i` is `blob[offsets[i]:offsets[i + 1]]`.
+    """
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+class _Index(Mapping):
+    """
+    Maps strings to their position in `strings`, using binary search
+    over `order`, the positions sorted by string.
+    """
+
+    def __init__(self, strings, order):
+        self.strings = strings
+        self.order = order
+
+    def __getitem__(self, key):
+        i = bisect_left(self.order, key, key=self.strings.__getitem__)
+        if i == len(self.order) or self.strings[self.order[i]] != key:
+            raise KeyError(key)
+        return self.order[i]
+
+    def __iter__(self):
+        return iter(self.strings)
+
+    def __len__(self):
+        return len(self.strings)
+
+
+def _pack_strings(strings):
+    """
+    Returns an offsets array and a UTF-8 blob holding `strings`.
+    """
+    offsets = array("q", [0])
+    blob = bytearray()
+    for string in strings:
+        blob += string.encode("utf-8")
+        offsets.append(len(blob))
+    return offsets, blob
+
+
+def _align(position):
+    """
+    Rounds `position` up to a multiple of 8.
+    """
+    return (position + 7) & ~7
@@ -0,0 +1,97 @@
+import argparse
+import csv
+import itertools
+import os
+import random
+
+FIRST_NAMES = [
+    "Alex", "Anna", "Ben", "Carla", "Chris", "Dana", "David", "Elena", "Emma", "Frank",
+    "Grace", "Hana", "Ian", "Jack", "Julia", "Karl", "Laura", "Leo", "Maria", "Mark",
+    "Nina", "Omar", "Paul", "Rosa", "Sam", "Sara", "Tom", "Vera", "Will", "Zoe"
+]
+
+LAST_NAMES = [
+    "Adams", "Baker", "Brown", "Clark", "Davis", "Evans", "Fischer", "Garcia", "Hall",
+    "Jones", "King", "Lee", "Lopez", "Martin", "Miller", "Moore", "Nguyen", "Novak",
+    "Patel", "Rossi", "Schmidt", "Smith", "Taylor", "Walker", "White", "Wilson", "Young"
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        usage="python synthetic.py directory [--people N] [--movies N] [--seed S]",
+        description="Write a synthetic people/movies/stars dataset in the format of small/.")
+    parser.add_argument("directory")
+    parser.add_argument("--people", type=int, default=1000000)
+    parser.add_argument("--movies", type=int, default=500000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cast-exponent", type=float, default=1.6,
+                        help="power-law exponent of the cast size distribution")
+    parser.add_argument("--max-cast", type=int, default=60)
+    parser.add_argument("--popularity-exponent", type=float, default=0.8,
+                        help="power-law exponent of how often people are cast")
+    args = parser.parse_args()
+
+    generate(args.directory, args.people, args.movies, args.seed,
+             args.cast_exponent, args.max_cast, args.popularity_exponent)
+    print(f"Wrote {args.people} people and {args.movies} movies to {args.directory}")
+
+
+def generate(directory, people, movies, seed=0, cast_exponent=1.6, max_cast=60,
+             popularity_exponent=0.8):
+    """
+    Write people.csv, movies.csv and stars.csv to `directory`.
+
+    Cast sizes follow a truncated power law P(k) ~ k^-cast_exponent for
+    1 <= k <= max_cast, and the people in a cast are drawn with weight
+    rank^-popularity_exponent, so a few people star in very many movies.
+    Every run with the same arguments writes the same files.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+
+    with open(os.path.join(directory, "people.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_NONNUMERIC)
+        writer.writerow(["id", "name", "birth"])
+        for person in range(people):
+            name = f"{rng.choice(FIRST_NAMES)} {_middle(rng)}{rng.choice(LAST_NAMES)}"
+            writer.writerow([person + 1, name, rng.randint(1900, 2010)])
+
+    with open(os.path.join(directory, "movies.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_NONNUMERIC)
+        writer.writerow(["id", "title", "year"])
+        for movie in range(movies):
+            writer.writerow([movie + 1, f"Movie {movie + 1}", rng.randint(1920, 2020)])
+
+    # Cumulative weights for cast sizes and for casting each person
+    cast_weights = list(itertools.accumulate(
+        k ** -cast_exponent for k in range(1, max_cast + 1)))
+    popularity = list(itertools.accumulate(
+        (rank + 1) ** -popularity_exponent for rank in range(people)))
+
+    # Shuffle ranks so popular people are spread over the id range
+    ranking = list(range(1, people + 1))
+    rng.shuffle(ranking)
+
+    with open(os.path.join(directory, "stars.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        for movie in range(1, movies + 1):
+            size = rng.choices(range(1, max_cast + 1), cum_weights=cast_weights)[0]
+            cast = set(rng.choices(ranking, cum_weights=popularity, k=min(size, people)))
+            for person in sorted(cast):
+                writer.writerow([person, movie])
+
+
+def _middle(rng):
+    """
+    Returns a middle initial for most people, so that names repeat
+    sometimes but not for nearly everyone.
+    """
+    if rng.random() < 0.2:
+        return ""
+    return f"{chr(rng.randrange(26) + ord('A'))}. "
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,6 @@
+from collections import OrderedDict, deque
+
+
 class Node():
     def __init__(self, state, parent, action):
         self.state = state
@@ -7,13 +10,17 @@ class Node():
 
 class StackFrontier():
     def __init__(self):
-        self.frontier = []
+        self.frontier = deque()
+
+        # Counts how many nodes in the frontier hold each state
+        self.states = {}
 
     def add(self, node):
         self.frontier.append(node)
+        self.states[node.state] = self.states.get(node.state, 0) + 1
 
     def contains_state(self, state):
-        return any(node.state == state for node in self.frontier)
+        return state in self.states
 
     def empty(self):
         return len(self.frontier) == 0
@@ -22,10 +29,20 @@ class StackFrontier():
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[-1]
-            self.frontier = self.frontier[:-1]
+            node = self.frontier.pop()
+            self.discard(node.state)
             return node
 
+    def discard(self, state):
+        """
+        Forget one node with `state` in the state index.
+        """
+        count = self.states[state] - 1
+        if count:
+            self.states[state] = count
+        else:
+            del self.states[state]
+
 
 class QueueFrontier(StackFrontier):
 
@@ -33,6 +50,124 @@ class QueueFrontier(StackFrontier):
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[0]
-            self.frontier = self.frontier[1:]
+            node = self.frontier.popleft()
+            self.discard(node.state)
             return node
+
+
+class LRUCache():
+    """
+    Bounded mapping that evicts the least recently used entry
+    and counts hits and misses.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def discard(self, key):
+        self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+
+    def invalidate(self, predicate):
+        """
+        Drop every entry for which `predicate(key, value)` is true,
+        and return how many were dropped.
+        """
+        stale = [key for key, value in self.entries.items() if predicate(key, value)]
+        for key in stale:
+            del self.entries[key]
+        return len(stale)
+
+    def stats(self):
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class SearchStats():
+    """
+    Metrics of one search, filled in by `shortest_path` when passed in.
+    """
+
+    FIELDS = ["expanded", "peak_frontier", "neighbor_checks", "path_length", "seconds"]
+
+    def __init__(self):
+        # People taken off the frontier and expanded
+        self.expanded = 0
+        # Largest number of people waiting on the frontier(s) at once
+        self.peak_frontier = 0
+        # (movie, person) neighbors looked at while expanding
+        self.neighbor_checks = 0
+        # Degrees of separation found, None if not connected
+        self.path_length = None
+        # Wall time of the search
+        self.seconds = 0.0
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+
+class StatsSummary():
+    """
+    Aggregates `SearchStats` over many searches.
+    """
+
+    def __init__(self):
+        self.searches = 0
+        self.connected = 0
+        self.totals = {field: 0 for field in SearchStats.FIELDS}
+        self.maxima = {field: 0 for field in SearchStats.FIELDS}
+
+    def add(self, stats):
+        """
+        Add one search, given as `SearchStats` or its `as_dict()`.
+        """
+        if isinstance(stats, SearchStats):
+            stats = stats.as_dict()
+        self.searches += 1
+        if stats["path_length"] is not None:
+            self.connected += 1
+        for field in SearchStats.FIELDS:
+            value = stats[field] or 0
+            self.totals[field] += value
+            self.maxima[field] = max(self.maxima[field], value)
+
+    def as_dict(self):
+        return {
+            "searches": self.searches,
+            "connected": self.connected,
+            "mean": {
+                field: self.totals[field] / (self.connected if field == "path_length" else self.searches)
+                if (self.connected if field == "path_length" else self.searches) else None
+                for field in SearchStats.FIELDS
+            },
+            "max": dict(self.maxima)
+        }
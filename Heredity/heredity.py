@@ -3,6 +3,8 @@ import itertools
 import sys
 from math import prod
 
+from inference import marginals
+
 PROBS = {
 
     # Unconditional probabilities for having gene
@@ -44,6 +46,27 @@ def main():
         sys.exit("Usage: python heredity.py data.csv")
     people = load_data(sys.argv[1])
 
+    # Exact inference on the pedigree, rather than enumerating every
+    # assignment of genes and traits with `enumerate_probabilities`
+    probabilities = marginals(people, PROBS)
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                print(f"    {value}: {p:.4f}")
+
+
+def enumerate_probabilities(people):
+    """
+    Compute the gene and trait distribution of every person by summing
+    `joint_probability` over every assignment of genes and traits that
+    agrees with the known traits. Takes on the order of 2^n * 3^n steps
+    for n people; `inference.marginals` gives the same result faster.
+    """
     # Keep track of gene and trait probabilities for each person
     probabilities = {
         person: {
@@ -82,15 +105,7 @@ def main():
 
     # Ensure probabilities sum to 1
     normalize(probabilities)
-
-    # Print results
-    for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+    return probabilities
 
 
 def load_data(filename):
@@ -0,0 +1,206 @@
+import heapq
+import itertools
+
+# Number of copies of the gene a person can have
+GENES = (2, 1, 0)
+
+
+def marginals(people, probs):
+    """
+    Compute the gene and trait distribution of every person in `people`,
+    as loaded by `load_data`, given the known traits, by variable
+    elimination on the pedigree as a Bayesian network built from `probs`
+    (the `PROBS` tables).
+
+    Returns the same dictionary as `heredity.enumerate_probabilities`,
+    already normalized: person -> {"gene": {2: p, 1: p, 0: p},
+    "trait": {True: p, False: p}}.
+
+    People are eliminated one bucket at a time in min-fill order, and a
+    second pass back through the buckets gives every person's marginal,
+    so the whole family takes two passes rather than one per person.
+    Time is linear in the number of people and exponential only in the
+    largest bucket, which stays within a nuclear family on pedigrees
+    without marriage loops.
+    """
+    factors = pedigree_factors(people, probs)
+    order = elimination_order(factors)
+    position = {variable: i for i, variable in enumerate(order)}
+
+    # Every factor goes into the bucket of its variable eliminated first
+    buckets = {variable: [] for variable in order}
+    for factor in factors:
+        buckets[min(factor[0], key=position.get)].append(factor)
+
+    # Forward pass: eliminating a bucket's variable sends a message to
+    # the bucket of the next variable in its scope, its parent
+    messages = dict()
+    children = {variable: [] for variable in order}
+    for variable in order:
+        functions = buckets[variable] + [messages[child] for child in children[variable]]
+        scope = _scope(functions) - {variable}
+        messages[variable] = sum_product(functions, scope)
+        if scope:
+            children[min(scope, key=position.get)].append(variable)
+
+    # Backward pass: every bucket sends its children what the rest of the
+    # network says about the variables they share
+    parent_messages = dict()
+    gene_distributions = dict()
+    for variable in reversed(order):
+        functions = buckets[variable] + [messages[child] for child in children[variable]]
+        if variable in parent_messages:
+            functions.append(parent_messages[variable])
+        gene_distributions[variable] = sum_product(functions, {variable})
+        for child in children[variable]:
+            others = [function for function in functions if function is not messages[child]]
+            parent_messages[child] = sum_product(others, set(messages[child][0]))
+
+    probabilities = dict()
+    for person in people:
+        table = gene_distributions[person][1]
+        total = sum(table.values())
+        gene = {copies: table[(copies,)] / total for copies in GENES}
+
+        trait = people[person]["trait"]
+        if trait is None:
+            have_trait = sum(gene[copies] * probs["trait"][copies][True] for copies in GENES)
+        else:
+            have_trait = 1.0 if trait else 0.0
+        probabilities[person] = {
+            "gene": gene,
+            "trait": {True: have_trait, False: 1 - have_trait}
+        }
+    return probabilities
+
+
+def pedigree_factors(people, probs):
+    """
+    Return the factors of the pedigree, one per person, over gene variables
+    named by person. Each factor is a (variables, table) pair where
+    `table` maps a tuple of gene counts for `variables` to a probability.
+
+    A person's factor is their gene distribution, from `probs["gene"]` or
+    inherited from both parents with mutation, times the probability of
+    their trait if it is known. Unknown traits sum out to 1 and are left out.
+    """
+    mutation = probs["mutation"]
+
+    # Probability of a parent with that many copies passing the gene on
+    passing = {2: 1 - mutation, 1: 0.5, 0: mutation}
+
+    factors = []
+    for person, data in people.items():
+        trait = data["trait"]
+        evidence = {
+            copies: 1.0 if trait is None else probs["trait"][copies][trait]
+            for copies in GENES
+        }
+        mother, father = data["mother"], data["father"]
+        if mother is None or father is None:
+            table = {(copies,): probs["gene"][copies] * evidence[copies] for copies in GENES}
+            factors.append(((person,), table))
+            continue
+
+        table = dict()
+        for from_mother, from_father in itertools.product(GENES, repeat=2):
+            m, f = passing[from_mother], passing[from_father]
+            inherited = {
+                2: m * f,
+                1: m * (1 - f) + (1 - m) * f,
+                0: (1 - m) * (1 - f)
+            }
+            for copies in GENES:
+                table[(copies, from_mother, from_father)] = inherited[copies] * evidence[copies]
+        factors.append(((person, mother, father), table))
+    return factors
+
+
+def elimination_order(factors):
+    """
+    Return an order to eliminate all variables of `factors` in, chosen
+    greedily by the min-fill heuristic: next is always the variable whose
+    elimination connects the fewest unconnected pairs of its neighbours.
+    Ties go to the variable with the fewest neighbours, then by name.
+
+    On a pedigree without marriage loops this eliminates people from the
+    leaves inwards, and no factor grows beyond a family.
+    """
+    neighbours = dict()
+    for variables, _ in factors:
+        for variable in variables:
+            neighbours.setdefault(variable, set()).update(variables)
+    for variable in neighbours:
+        neighbours[variable].discard(variable)
+
+    def cost(variable):
+        fill = sum(
+            1 for a, b in itertools.combinations(neighbours[variable], 2)
+            if b not in neighbours[a]
+        )
+        return (fill, len(neighbours[variable]), variable)
+
+    # Costs only change around an eliminated variable, so they are kept
+    # in a heap and pushed again when they do; stale entries are skipped
+    costs = {variable: cost(variable) for variable in neighbours}
+    heap = list(costs.values())
+    heapq.heapify(heap)
+
+    order = []
+    while heap:
+        entry = heapq.heappop(heap)
+        variable = entry[-1]
+        if costs.get(variable) != entry:
+            continue
+        del costs[variable]
+        adjacent = neighbours.pop(variable)
+        for neighbour in adjacent:
+            neighbours[neighbour].discard(variable)
+            neighbours[neighbour].update(adjacent - {neighbour})
+        order.append(variable)
+
+        affected = set(adjacent)
+        for neighbour in adjacent:
+            affected.update(neighbours[neighbour])
+        for other in affected:
+            costs[other] = cost(other)
+            heapq.heappush(heap, costs[other])
+    return order
+
+
+def sum_product(factors, keep):
+    """
+    Multiply `factors` into one over all their variables and sum out every
+    variable not in `keep`. Returns the result as a (variables, table)
+    factor over the variables in `keep`, in sorted order.
+
+    The result is scaled so that its largest entry is 1, which keeps long
+    products from underflowing. Marginals are normalized in the end, so
+    the scale drops out.
+    """
+    scope = sorted(_scope(factors))
+    kept = [i for i, variable in enumerate(scope) if variable in keep]
+    lookups = [
+        (table, [scope.index(variable) for variable in variables])
+        for variables, table in factors
+    ]
+
+    table = dict()
+    for values in itertools.product(GENES, repeat=len(scope)):
+        p = 1.0
+        for factor, indices in lookups:
+            p *= factor[tuple(values[i] for i in indices)]
+        key = tuple(values[i] for i in kept)
+        table[key] = table.get(key, 0.0) + p
+
+    largest = max(table.values())
+    if largest > 0:
+        table = {values: p / largest for values, p in table.items()}
+    return tuple(scope[i] for i in kept), table
+
+
+def _scope(factors):
+    """
+    Return the set of variables of `factors`.
+    """
+    return {variable for variables, _ in factors for variable in variables}
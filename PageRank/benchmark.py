@@ -0,0 +1,147 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import pagerank
+import synthetic
+from linkgraph import LinkGraph, power_iteration
+
+# Stopping rule of the high-precision reference ranks
+REFERENCE_TOLERANCE = 1e-14
+REFERENCE_ITERATIONS = 100000
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        usage="python benchmark.py [--sizes N ...] [--samples N] [--seed S] [--json FILE]",
+        description="Time crawling and PageRank on synthetic corpora of growing size.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 1000],
+                        help="numbers of pages of the corpora")
+    parser.add_argument("--samples", type=int, default=pagerank.SAMPLES)
+    parser.add_argument("--links", type=float, default=8)
+    parser.add_argument("--dangling", type=float, default=0.1)
+    parser.add_argument("--exponent", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--directory", help="write the corpora here rather than a temporary directory")
+    parser.add_argument("--json", metavar="FILE", help="also write the report as JSON")
+    args = parser.parse_args()
+
+    report = run(args)
+    print(f"python {report['python']} on {report['platform']}")
+    print(f"{'pages':>8} {'links':>8} {'function':>18} {'iterations':>10} "
+          f"{'seconds':>9} {'peak_mb':>8} {'l1_error':>10}")
+    for corpus in report["corpora"]:
+        for name, result in corpus["results"].items():
+            error = "" if result["l1_error"] is None else f"{result['l1_error']:.2e}"
+            iterations = "" if result["iterations"] is None else result["iterations"]
+            print(f"{corpus['pages']:>8} {corpus['links']:>8} {name:>18} {iterations:>10} "
+                  f"{result['seconds']:>9.3f} {result['peak_mb']:>8.1f} {error:>10}")
+    print(f"peak_rss_mb: {report['peak_rss_mb']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def run(args):
+    """
+    Generate a corpus of each of `args.sizes` pages and measure `crawl`,
+    `sample_pagerank`, `iterate_pagerank` and `vector_pagerank` on it.
+    """
+    with tempfile.TemporaryDirectory() as temporary:
+        directory = args.directory or temporary
+        corpora = [
+            measure_corpus(os.path.join(directory, f"synthetic{size}"), size, args)
+            for size in args.sizes
+        ]
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "samples": args.samples,
+        "seed": args.seed,
+        "corpora": corpora,
+        "peak_rss_mb": round(peak_rss(), 1)
+    }
+
+
+def measure_corpus(directory, size, args):
+    """
+    Write one synthetic corpus to `directory` and measure every function
+    on it against the reference ranks.
+
+    Every function is timed first, then run again under tracemalloc for
+    its peak allocated memory, as tracing slows Python code down.
+    """
+    synthetic.generate(directory, size, args.links, args.dangling, args.exponent, args.seed)
+    corpus, crawl_result = measure(pagerank.crawl, directory)
+
+    graph = LinkGraph.from_corpus(corpus)
+    reference, _ = power_iteration(graph, pagerank.DAMPING, REFERENCE_TOLERANCE,
+                                   REFERENCE_ITERATIONS)
+    reference = graph.ranks(reference)
+
+    # `iterate_pagerank` runs until no page changes by 0.001 or more,
+    # which takes as many steps as power iteration in the L-infinity norm
+    _, iterations = power_iteration(graph, pagerank.DAMPING, 0.001, norm="linf")
+    _, vector_iterations = power_iteration(graph, pagerank.DAMPING)
+
+    results = {"crawl": crawl_result}
+    for name, function, arguments, steps in [
+        ("sample_pagerank", pagerank.sample_pagerank, (args.samples,), None),
+        ("iterate_pagerank", pagerank.iterate_pagerank, (), iterations),
+        ("vector_pagerank", pagerank.vector_pagerank, (), vector_iterations)
+    ]:
+        # `iterate_pagerank` links dangling pages to the whole corpus in place
+        ranks, results[name] = measure(
+            lambda: function({page: set(links) for page, links in corpus.items()},
+                             pagerank.DAMPING, *arguments))
+        results[name]["iterations"] = steps
+        results[name]["l1_error"] = sum(abs(ranks[page] - reference[page]) for page in reference)
+
+    return {
+        "pages": len(corpus),
+        "links": int(len(graph.targets)),
+        "dangling": int(np.count_nonzero(graph.dangling)),
+        "results": results
+    }
+
+
+def measure(function, *arguments):
+    """
+    Returns what `function` returns and a dictionary of its wall time and
+    peak traced memory in megabytes.
+    """
+    start = time.perf_counter()
+    result = function(*arguments)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    function(*arguments)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, {
+        "seconds": round(seconds, 4),
+        "peak_mb": round(peak / (1024 * 1024), 2),
+        "iterations": None,
+        "l1_error": None
+    }
+
+
+def peak_rss():
+    """
+    Returns the peak resident set size of this process in megabytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import time
+
+import numpy as np
+
+# Norms `power_iteration` can measure the change between iterations in
+NORMS = ["l1", "linf"]
+
+# Ways of updating the rank vector in one iteration
+METHODS = ["power", "gauss-seidel"]
+
+# Extrapolations that can be applied every EXTRAPOLATION_PERIOD iterations
+EXTRAPOLATIONS = [None, "aitken", "quadratic"]
+EXTRAPOLATION_PERIOD = 10
+
+
+def residual(new_rank, rank, norm="l1"):
+    """
+    Returns the change between two rank vectors in `norm`.
+    """
+    if norm == "l1":
+        return np.abs(new_rank - rank).sum()
+    if norm == "linf":
+        return np.abs(new_rank - rank).max(initial=0)
+    raise ValueError(f"Unknown norm {norm}, expected one of {NORMS}")
+
+
+def extrapolate(history, method):
+    """
+    Returns an estimate of the limit of the iterates in `history`, the
+    last rank vectors from oldest to newest, or None if there are too
+    few of them.
+
+    Both methods assume the error is dominated by the second and third
+    eigenvectors of the transition matrix and cancel them out:
+    "aitken" componentwise from the last three iterates, "quadratic" by
+    a least-squares fit over the last four.
+    """
+    history = list(history)
+    if method == "aitken":
+        if len(history) < 3:
+            return None
+        older, old, new = history[-3:]
+        first = old - older
+        second = new - 2 * old + older
+        safe = np.abs(second) > 1e-300
+        estimate = new.copy()
+        estimate[safe] = older[safe] - first[safe] ** 2 / second[safe]
+    elif method == "quadratic":
+        if len(history) < 4:
+            return None
+        base, older, old, new = history[-4:]
+        differences = np.column_stack([older - base, old - base])
+        gamma, *_ = np.linalg.lstsq(differences, -(new - base), rcond=None)
+        gamma = [*gamma, 1.0]
+        estimate = (sum(gamma) * older + (gamma[1] + gamma[2]) * old + gamma[2] * new)
+    else:
+        raise ValueError(f"Unknown extrapolation {method}, expected one of {EXTRAPOLATIONS}")
+
+    # Rank vectors are distributions: keep the estimate one
+    np.clip(estimate, 0, None, out=estimate)
+    total = estimate.sum()
+    return estimate / total if total > 0 else None
+
+
+class ConvergenceTrace():
+    """
+    Residuals of every iteration, collected when passed as the `trace`
+    hook of `power_iteration`. Any callable taking the same arguments
+    can be used as a hook instead.
+    """
+
+    FIELDS = ["iteration", "l1", "linf", "extrapolated", "seconds"]
+
+    def __init__(self):
+        self.rows = []
+        self.start = time.perf_counter()
+
+    def __call__(self, iteration, l1, linf, extrapolated):
+        self.rows.append((iteration, l1, linf, extrapolated, time.perf_counter() - self.start))
+
+    def rate(self):
+        """
+        Returns the average factor the L1 residual shrank by per plain
+        iteration, an estimate of the modulus of the second eigenvalue
+        of the transition matrix. Close to 1 means slow convergence.
+        """
+        ratios = [
+            current[1] / previous[1]
+            for previous, current in zip(self.rows, self.rows[1:])
+            if previous[1] > 0 and current[1] > 0 and not previous[3] and not current[3]
+        ]
+        if not ratios:
+            return None
+        return float(np.exp(np.mean(np.log(ratios))))
+
+    def as_dict(self):
+        return {
+            "iterations": len(self.rows),
+            "rate": self.rate(),
+            "trace": [dict(zip(self.FIELDS, row)) for row in self.rows]
+        }
@@ -0,0 +1,237 @@
+import json
+import mmap
+import os
+import re
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import edgelist
+
+# Link cache written into the corpus directory
+FILENAME = "pagerank.links"
+
+MAGIC = b"PRLINKS1"
+
+# Same pattern as `pagerank.crawl`, matched against the raw bytes of a file
+LINK = re.compile(rb"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Files handed to a worker at once
+CHUNKSIZE = 256
+
+# Files at least this large are memory-mapped, smaller ones read at once
+MMAP_SIZE = 1 << 16
+
+# Print a progress line every this many pages
+PROGRESS = 10000
+
+
+def crawl(directory, workers=None, threads=False, chunksize=CHUNKSIZE, progress=False,
+          cache=False, edges=False):
+    """
+    Return the same dictionary as `pagerank.crawl`: every HTML page in
+    `directory` mapped to the set of other pages in it that it links to.
+
+    Files are parsed in chunks on a pool of `workers` processes (threads
+    with `threads` set), and large files are memory-mapped rather than
+    read into a string. Pages are added to the index as chunks come back,
+    and with `progress` set, counters are printed to stderr.
+
+    With `cache` set, the links found in every file are kept in a cache
+    file in `directory`, and only files whose mtime or size changed since
+    are parsed again. If the cache cannot be written, the crawl goes on
+    without it.
+
+    With `edges` set, the links are also exported to an edge list file in
+    `directory` that `edgelist.stream_power_iteration` can rank out of core.
+    """
+    files = {
+        entry.name: entry.stat()
+        for entry in os.scandir(directory)
+        if entry.name.endswith(".html") and entry.is_file()
+    }
+    stats = {name: (stat.st_mtime_ns, stat.st_size) for name, stat in files.items()}
+
+    cached = read_cache(os.path.join(directory, FILENAME)) if cache else {}
+    pages = {}
+    for filename, (stat, links) in cached.items():
+        if stats.get(filename) == stat:
+            pages[filename] = links
+    changed = [filename for filename in files if filename not in pages]
+    if progress and cache:
+        print(f"Reusing {len(pages)} cached pages, parsing {len(changed)}", file=sys.stderr)
+
+    links = sum(len(found) for found in pages.values())
+    for filename, found in _parse(directory, changed, workers, threads, chunksize):
+        pages[filename] = found
+        links += len(found)
+        if progress and len(pages) % PROGRESS == 0:
+            print(f"Crawled {len(pages)}/{len(files)} pages, {links} links", file=sys.stderr)
+    if progress:
+        print(f"Crawled {len(pages)} pages, {links} links", file=sys.stderr)
+
+    if cache and (changed or len(cached) != len(pages)):
+        try:
+            write_cache(os.path.join(directory, FILENAME),
+                        {filename: (stats[filename], pages[filename]) for filename in pages})
+        except OSError as e:
+            # A read-only corpus is still crawled, just without the cache
+            if progress:
+                print(f"Not caching links: {e}", file=sys.stderr)
+
+    # Only include links to other pages in the corpus
+    corpus = {
+        filename: {link for link in found if link in pages}
+        for filename, found in pages.items()
+    }
+    if edges:
+        edgelist.write(os.path.join(directory, edgelist.FILENAME), corpus)
+    return corpus
+
+
+def _parse(directory, filenames, workers, threads, chunksize):
+    """
+    Yields (filename, set of linked pages) for `filenames`, parsed on a
+    pool unless they all fit in one chunk.
+    """
+    if len(filenames) <= chunksize:
+        yield from parse_files(directory, filenames)
+        return
+    chunks = [filenames[i:i + chunksize] for i in range(0, len(filenames), chunksize)]
+    executor = ThreadPoolExecutor if threads else ProcessPoolExecutor
+    with executor(workers) as pool:
+        for parsed in pool.map(parse_files, [directory] * len(chunks), chunks):
+            yield from parsed
+
+
+def parse_files(directory, filenames):
+    """
+    Returns (filename, set of linked pages) for each of `filenames`.
+    """
+    return [
+        (filename, parse_file(os.path.join(directory, filename)) - {filename})
+        for filename in filenames
+    ]
+
+
+def parse_file(path):
+    """
+    Returns the set of link targets in the HTML file at `path`.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < MMAP_SIZE:
+            return {link.decode("utf-8") for link in LINK.findall(f.read())}
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as contents:
+            return {link.decode("utf-8") for link in LINK.findall(contents)}
+
+
+def write_cache(path, entries):
+    """
+    Save a cache of filename -> ((mtime_ns, size), links in the file) to
+    `path`: the magic bytes, an 8-byte header length, a JSON header with
+    the section sizes, then the sections. Every distinct link is stored
+    once, and each file holds the positions of its links.
+    """
+    filenames = list(entries)
+    mtimes = array("q", (entries[filename][0][0] for filename in filenames))
+    sizes = array("q", (entries[filename][0][1] for filename in filenames))
+    link_ids = {}
+    link_offsets = array("q", [0])
+    file_links = array("i")
+    for filename in filenames:
+        for link in sorted(entries[filename][1]):
+            file_links.append(link_ids.setdefault(link, len(link_ids)))
+        link_offsets.append(len(file_links))
+
+    sections = {"mtimes": mtimes, "sizes": sizes, "link_offsets": link_offsets,
+                "file_links": file_links}
+    for name, strings in [("filenames", filenames), ("links", list(link_ids))]:
+        sections[f"{name}.offsets"], sections[f"{name}.blob"] = _pack_strings(strings)
+
+    header = json.dumps({
+        "byteorder": sys.byteorder,
+        "sections": [
+            [name, data.typecode if isinstance(data, array) else "B", len(data)]
+            for name, data in sections.items()
+        ]
+    }).encode("utf-8")
+
+    # Write to a temporary file first so readers never see a partial cache
+    temporary = f"{path}.tmp"
+    try:
+        with open(temporary, "wb") as f:
+            f.write(MAGIC)
+            f.write(len(header).to_bytes(8, "little"))
+            f.write(header)
+            for data in sections.values():
+                f.write(data)
+        os.replace(temporary, path)
+    except OSError:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def read_cache(path):
+    """
+    Load a cache written by `write_cache`. Returns an empty cache if the
+    file is missing, unreadable or was written on a machine of another
+    byte order.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return {}
+    if data[:len(MAGIC)] != MAGIC:
+        return {}
+    length = int.from_bytes(data[len(MAGIC):len(MAGIC) + 8], "little")
+    position = len(MAGIC) + 8 + length
+    try:
+        header = json.loads(data[len(MAGIC) + 8:position])
+        if header["byteorder"] != sys.byteorder:
+            return {}
+        sections = {}
+        for name, typecode, count in header["sections"]:
+            if typecode == "B":
+                sections[name] = data[position:position + count]
+                position += count
+            else:
+                sections[name] = array(typecode)
+                size = count * sections[name].itemsize
+                sections[name].frombytes(data[position:position + size])
+                position += size
+    except (ValueError, KeyError):
+        return {}
+    if position != len(data):
+        return {}
+
+    filenames = _unpack_strings(sections["filenames.offsets"], sections["filenames.blob"])
+    links = _unpack_strings(sections["links.offsets"], sections["links.blob"])
+    offsets, file_links = sections["link_offsets"], sections["file_links"]
+    return {
+        filename: (
+            (sections["mtimes"][i], sections["sizes"][i]),
+            {links[j] for j in file_links[offsets[i]:offsets[i + 1]]}
+        )
+        for i, filename in enumerate(filenames)
+    }
+
+
+def _pack_strings(strings):
+    """
+    Returns an offsets array and a UTF-8 blob holding `strings`.
+    """
+    offsets = array("q", [0])
+    blob = bytearray()
+    for string in strings:
+        blob += string.encode("utf-8")
+        offsets.append(len(blob))
+    return offsets, blob
+
+
+def _unpack_strings(offsets, blob):
+    """
+    Returns the list of strings packed by `_pack_strings`.
+    """
+    return [str(blob[offsets[i]:offsets[i + 1]], "utf-8") for i in range(len(offsets) - 1)]
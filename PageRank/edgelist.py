@@ -0,0 +1,158 @@
+import json
+import os
+import sys
+
+import numpy as np
+
+from linkgraph import MAX_ITERATIONS, TOLERANCE
+
+# Edge list written into the corpus directory by `crawler.crawl`
+FILENAME = "pagerank.edges"
+
+MAGIC = b"PREDGES1"
+
+# Edges read from the file at once by `stream_power_iteration`
+CHUNK = 1 << 22
+
+# Sections start at multiples of this many bytes
+ALIGNMENT = 8
+
+
+def write(path, corpus):
+    """
+    Save a `crawl` dictionary of page -> set of linked pages to `path` as
+    a binary edge list: the magic bytes, an 8-byte header length, a JSON
+    header with the section sizes, then the sections, each aligned to
+    ALIGNMENT bytes:
+
+        degrees     int32 out-degree of every page
+        edges       (source, target) int32 pairs sorted by target, then source
+        offsets     int64 offsets of the page names in `names`
+        names       UTF-8 page names, in sorted order
+
+    Pages are numbered in sorted order like in `LinkGraph`, and links to
+    pages outside the corpus are ignored.
+    """
+    pages = sorted(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+    degrees = np.zeros(len(pages), dtype=np.int32)
+    sources = []
+    targets = []
+    for i, page in enumerate(pages):
+        links = [index[link] for link in corpus[page] if link in index]
+        degrees[i] = len(links)
+        sources.extend([i] * len(links))
+        targets.extend(links)
+    sources = np.array(sources, dtype=np.int32)
+    targets = np.array(targets, dtype=np.int32)
+    order = np.lexsort((sources, targets))
+    edges = np.column_stack([sources[order], targets[order]])
+
+    encoded = [page.encode("utf-8") for page in pages]
+    offsets = np.zeros(len(pages) + 1, dtype=np.int64)
+    np.cumsum([len(name) for name in encoded], out=offsets[1:])
+    sections = {"degrees": degrees, "edges": edges, "offsets": offsets,
+                "names": np.frombuffer(b"".join(encoded), dtype=np.uint8)}
+
+    header = json.dumps({
+        "byteorder": sys.byteorder,
+        "pages": len(pages),
+        "edges": len(edges),
+        "sections": [[name, data.dtype.str, data.nbytes] for name, data in sections.items()]
+    }).encode("utf-8")
+
+    # Write to a temporary file first so readers never see a partial edge list
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        for data in sections.values():
+            f.write(bytes(-f.tell() % ALIGNMENT))
+            f.write(data.tobytes())
+    os.replace(temporary, path)
+
+
+class EdgeList():
+    """
+    An edge list written by `write`, memory-mapped rather than read, so
+    graphs larger than memory can be ranked by `stream_power_iteration`.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a PageRank edge list")
+            length = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(length))
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError(f"{path} was written on a machine of another byte order")
+
+        position = len(MAGIC) + 8 + length
+        sections = {}
+        for name, dtype, size in header["sections"]:
+            position += -position % ALIGNMENT
+            dtype = np.dtype(dtype)
+            sections[name] = np.memmap(path, dtype=dtype, mode="r", offset=position,
+                                       shape=(size // dtype.itemsize,))
+            position += size
+
+        self.path = path
+        self.degrees = sections["degrees"]
+        self.edges = sections["edges"].reshape(header["edges"], 2)
+        self.offsets = sections["offsets"]
+        self.names = sections["names"]
+
+    def __len__(self):
+        return len(self.degrees)
+
+    def page(self, i):
+        """
+        Returns the name of page `i`.
+        """
+        return bytes(self.names[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+    def ranks(self, rank):
+        """
+        Returns a rank vector as a dictionary of page -> PageRank.
+        """
+        return {self.page(i): value for i, value in enumerate(rank.tolist())}
+
+
+def stream_power_iteration(edges, damping_factor, tolerance=TOLERANCE,
+                           max_iterations=MAX_ITERATIONS, chunk=CHUNK):
+    """
+    Returns the PageRank vector of an `EdgeList` and the number of
+    iterations it took, like `linkgraph.power_iteration` with the L1 norm.
+
+    Every iteration is one sequential pass over the edges, `chunk` at a
+    time. As they are sorted by target, each chunk only adds to a slice
+    of the new rank vector, and only the old and new rank vectors are
+    kept in memory.
+    """
+    n = len(edges)
+    rank = np.full(n, 1 / n)
+    new_rank = np.empty(n)
+    iteration = 0
+    for iteration in range(1, max_iterations + 1):
+        new_rank.fill(0)
+        dangling = 0.0
+        for start in range(0, n, chunk):
+            degrees = edges.degrees[start:start + chunk]
+            dangling += rank[start:start + chunk][degrees == 0].sum()
+
+        for start in range(0, len(edges.edges), chunk):
+            pairs = np.asarray(edges.edges[start:start + chunk])
+            sources, targets = pairs[:, 0], pairs[:, 1]
+            first = targets[0]
+            shares = rank[sources] / edges.degrees[sources]
+            linked = np.bincount(targets - first, weights=shares)
+            new_rank[first:first + len(linked)] += linked
+
+        new_rank *= damping_factor
+        new_rank += (1 - damping_factor) / n + damping_factor * dangling / n
+        change = np.abs(new_rank - rank).sum()
+        rank, new_rank = new_rank, rank
+        if change < tolerance:
+            break
+    return rank, iteration
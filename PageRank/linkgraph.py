@@ -0,0 +1,296 @@
+from collections import deque
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import spsolve_triangular
+
+from convergence import EXTRAPOLATION_PERIOD, EXTRAPOLATIONS, METHODS, extrapolate, residual
+
+# Default stopping rule of `power_iteration`: the L1 change of the rank
+# vector between two iterations, and a cap on the number of iterations
+TOLERANCE = 1e-8
+MAX_ITERATIONS = 1000
+
+
+class LinkGraph():
+    """
+    A corpus compiled to integer arrays for vectorized PageRank.
+
+    Pages are numbered in sorted order. Links are stored in CSR form:
+    the pages linked to by page `i` are `targets[offsets[i]:offsets[i + 1]]`,
+    and `sources` holds the linking page of every entry of `targets`.
+    Pages without links are dangling: the random surfer leaves them
+    for any page of the corpus, themselves included.
+    """
+
+    def __init__(self, pages, offsets, targets, index=None):
+        # Page names and their positions, which can be shared with a
+        # graph of the same pages
+        self.pages = list(pages)
+        self.index = {page: i for i, page in enumerate(self.pages)} if index is None else index
+
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.targets = np.asarray(targets, dtype=np.int32)
+        self.out_degree = np.diff(self.offsets)
+        self.sources = np.repeat(
+            np.arange(len(self.pages), dtype=np.int32), self.out_degree)
+        self.dangling = self.out_degree == 0
+
+        # Sparse matrix of incoming links, built by `incoming` when first needed
+        self.in_links = None
+
+        # Damping factor and triangular parts of the transition matrix
+        # for Gauss-Seidel, built by `sweep` when first needed
+        self.splitting = None
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Compile a `crawl` dictionary of page -> set of linked pages.
+        Links to pages outside the corpus are ignored.
+        """
+        pages = sorted(corpus)
+        index = {page: i for i, page in enumerate(pages)}
+        offsets = np.zeros(len(pages) + 1, dtype=np.int64)
+        targets = []
+        for i, page in enumerate(pages):
+            links = sorted(index[link] for link in corpus[page] if link in index)
+            targets.extend(links)
+            offsets[i + 1] = len(targets)
+        return cls(pages, offsets, np.array(targets, dtype=np.int32))
+
+    def __len__(self):
+        return len(self.pages)
+
+    def links(self, i):
+        """
+        Returns the positions of the pages linked to by page `i`.
+        """
+        return self.targets[self.offsets[i]:self.offsets[i + 1]]
+
+    def incoming(self):
+        """
+        Returns the incoming links as a SciPy CSR matrix with a 1 in row
+        `i`, column `j` if page `j` links to page `i`. Its `indptr` and
+        `indices` are the incoming links in CSR form.
+        """
+        if self.in_links is None:
+            n = len(self.pages)
+            self.in_links = sparse.csr_matrix(
+                (np.ones(len(self.targets)), (self.targets, self.sources)), shape=(n, n))
+        return self.in_links
+
+    def update(self, changes):
+        """
+        Returns a new `LinkGraph` with `changes` applied, a dictionary of
+        page -> set of linked pages for added and relinked pages, or None
+        for removed pages. Links to pages not in the new graph are ignored.
+
+        Also returns the array of new positions of the old pages, -1 for
+        removed ones. Only the links of changed pages are compiled again,
+        and if no page is added or removed, the pages are not even
+        numbered again.
+        """
+        removed = {page for page, links in changes.items() if links is None and page in self.index}
+        added = {page for page, links in changes.items()
+                 if links is not None and page not in self.index}
+        if removed or added:
+            pages = sorted((set(self.pages) - removed) | added)
+            index = {page: i for i, page in enumerate(pages)}
+            mapping = np.array([index.get(page, -1) for page in self.pages], dtype=np.int64)
+        else:
+            pages, index = self.pages, self.index
+            mapping = np.arange(len(self.pages), dtype=np.int64)
+
+        # Links of unchanged pages carry over, except to removed pages
+        changed = np.zeros(len(self.pages), dtype=bool)
+        changed[[self.index[page] for page in changes if page in self.index]] = True
+        kept = ~changed[self.sources]
+        sources = mapping[self.sources[kept]]
+        targets = mapping[self.targets[kept]]
+        kept = targets >= 0
+
+        added_sources = []
+        added_targets = []
+        for page, links in changes.items():
+            if links is None:
+                continue
+            targets_of_page = sorted(index[link] for link in links if link in index)
+            added_sources.extend([index[page]] * len(targets_of_page))
+            added_targets.extend(targets_of_page)
+        sources = np.concatenate([sources[kept], np.array(added_sources, dtype=np.int64)])
+        targets = np.concatenate([targets[kept], np.array(added_targets, dtype=np.int64)])
+
+        # Positions keep their order, so the links carried over are still
+        # sorted, and a page's links are either all carried over or all
+        # added in order: a stable sort by source is enough
+        order = np.argsort(sources, kind="stable")
+        offsets = np.zeros(len(pages) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(pages)), out=offsets[1:])
+        return LinkGraph(pages, offsets, targets[order], index), mapping
+
+    def step(self, rank, damping_factor):
+        """
+        Returns the rank vector after one step of the random surfer from
+        `rank`: every page passes its rank on evenly over its links, and
+        dangling pages evenly over all pages.
+        """
+        n = len(self.pages)
+        share = np.divide(rank, self.out_degree, out=np.zeros(n), where=~self.dangling)
+        linked = np.bincount(self.targets, weights=share[self.sources], minlength=n)
+        spread = rank[self.dangling].sum() / n
+        return (1 - damping_factor) / n + damping_factor * (linked + spread)
+
+    def sweep(self, rank, damping_factor):
+        """
+        Returns the rank vector after one Gauss-Seidel sweep from `rank`:
+        like `step`, but every page is updated from the new values of the
+        pages before it, by solving the lower triangle of the links at
+        once. Rank left on dangling pages is spread from `rank`, so the
+        result is scaled back to sum to 1. This usually converges in
+        fewer sweeps than `step` takes steps.
+        """
+        n = len(self.pages)
+        if self.splitting is None or self.splitting[0] != damping_factor:
+            inverse = np.divide(1, self.out_degree, out=np.zeros(n), where=~self.dangling)
+            transition = damping_factor * (self.incoming() @ sparse.diags(inverse)).tocsr()
+            lower = sparse.identity(n, format="csr") - sparse.tril(transition, format="csr")
+            upper = sparse.triu(transition, k=1, format="csr")
+            # Without links to themselves, the diagonal is all ones,
+            # which the solver can skip
+            unit = not transition.diagonal().any()
+            self.splitting = (damping_factor, lower.tocsr(), upper, unit)
+        _, lower, upper, unit = self.splitting
+
+        spread = rank[self.dangling].sum() / n
+        known = (1 - damping_factor) / n + damping_factor * spread + upper @ rank
+        new_rank = spsolve_triangular(lower, known, lower=True, unit_diagonal=unit)
+        return new_rank / new_rank.sum()
+
+    def personalized_step(self, ranks, damping_factor, teleport):
+        """
+        Returns `step` applied to every column of the (pages, queries)
+        matrix `ranks`, where the surfer of column `j` jumps (and leaves
+        dangling pages) according to column `j` of `teleport` rather than
+        evenly. All columns share one pass over the links.
+        """
+        inverse = np.divide(1, self.out_degree, out=np.zeros(len(self.pages)),
+                            where=~self.dangling)
+        new_ranks = self.incoming() @ (ranks * inverse[:, None])
+        new_ranks *= damping_factor
+        spread = self.dangling.astype(float) @ ranks
+        new_ranks += teleport * (1 - damping_factor + damping_factor * spread)
+        return new_ranks
+
+    def ranks(self, rank):
+        """
+        Returns a rank vector as a dictionary of page -> PageRank.
+        """
+        return dict(zip(self.pages, rank.tolist()))
+
+
+def power_iteration(graph, damping_factor, tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS,
+                    start=None, norm="l1", method="power", extrapolation=None, trace=None):
+    """
+    Returns the PageRank vector of `graph` and the number of iterations
+    it took, starting from the uniform distribution (or from `start`,
+    such as the vector before a change to the graph) and stopping once
+    the change of the whole vector in `norm` ("l1" or "linf") is below
+    `tolerance`, or after `max_iterations`.
+
+    With `method` set to "gauss-seidel", iterations are `LinkGraph.sweep`
+    rather than `LinkGraph.step`. With `extrapolation` set to "aitken"
+    or "quadratic", the limit is extrapolated from the last iterates
+    every EXTRAPOLATION_PERIOD iterations (see `convergence.extrapolate`),
+    and the estimate replaces the iterate if one more step from it would
+    change less.
+    `trace` is called after every iteration with its number, the L1 and
+    L-infinity change, and whether it was extrapolated from, for example
+    with a `convergence.ConvergenceTrace`.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method}, expected one of {METHODS}")
+    if extrapolation not in EXTRAPOLATIONS:
+        raise ValueError(
+            f"Unknown extrapolation {extrapolation}, expected one of {EXTRAPOLATIONS}")
+    advance = graph.step if method == "power" else graph.sweep
+    n = len(graph)
+    rank = np.full(n, 1 / n) if start is None else start / start.sum()
+    history = deque(maxlen=4)
+    iteration = 0
+    for iteration in range(1, max_iterations + 1):
+        new_rank = advance(rank, damping_factor)
+        change = residual(new_rank, rank, norm)
+        if trace is not None:
+            changes = [residual(new_rank, rank, name) for name in ["l1", "linf"]]
+        rank = new_rank
+
+        extrapolated = False
+        if extrapolation is not None and change >= tolerance:
+            history.append(rank)
+            if iteration % EXTRAPOLATION_PERIOD == 0:
+                estimate = extrapolate(history, extrapolation)
+                # Only keep estimates closer to convergence than the iterate
+                if (estimate is not None and residual(
+                        advance(estimate, damping_factor), estimate, norm) < change):
+                    rank = estimate
+                    extrapolated = True
+                history.clear()
+
+        if trace is not None:
+            trace(iteration, *changes, extrapolated)
+        if change < tolerance:
+            break
+    return rank, iteration
+
+
+def update_power_iteration(graph, rank, changes, damping_factor, tolerance=TOLERANCE,
+                           max_iterations=MAX_ITERATIONS, **options):
+    """
+    Returns the graph after `changes` (see `LinkGraph.update`), its
+    PageRank vector and the number of iterations it took, given the
+    PageRank vector `rank` of `graph` from before them.
+
+    Iteration starts from the old vector, with an even share for new
+    pages, so small edits take a fraction of the iterations from scratch.
+    Callers that keep the returned graph and vector for the next update
+    never compile the whole corpus again. `options` go to `power_iteration`.
+    """
+    new, mapping = graph.update(changes)
+    start = np.full(len(new), 1 / len(new))
+    kept = mapping >= 0
+    start[mapping[kept]] = rank[kept]
+    rank, iterations = power_iteration(
+        new, damping_factor, tolerance, max_iterations, start, **options)
+    return new, rank, iterations
+
+
+def personalized_power_iteration(graph, teleport, damping_factor, tolerance=TOLERANCE,
+                                 max_iterations=MAX_ITERATIONS):
+    """
+    Returns the personalized PageRank vectors of `graph` for every column
+    of the (pages, queries) matrix `teleport`, each a distribution over
+    pages to jump to, as the columns of a matrix, and the number of
+    iterations it took until no column changed by `tolerance` in L1 norm.
+    Columns that have converged drop out of later iterations.
+    """
+    teleport = teleport / teleport.sum(axis=0)
+    result = np.empty_like(teleport)
+
+    # Columns still iterating, and their ranks and teleport vectors
+    columns = np.arange(teleport.shape[1])
+    ranks = teleport.copy()
+    iteration = 0
+    for iteration in range(1, max_iterations + 1):
+        new_ranks = graph.personalized_step(ranks, damping_factor, teleport)
+        converged = np.abs(new_ranks - ranks).sum(axis=0) < tolerance
+        ranks = new_ranks
+        if converged.any():
+            result[:, columns[converged]] = ranks[:, converged]
+            columns = columns[~converged]
+            ranks = ranks[:, ~converged]
+            teleport = teleport[:, ~converged]
+            if len(columns) == 0:
+                break
+    result[:, columns] = ranks
+    return result, iteration
@@ -0,0 +1,141 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Random surfers advanced together in every step
+WALKERS = 4096
+
+# The visits are split into this many batches, whose spread gives the
+# standard error of the estimate (the method of batch means)
+BATCHES = 32
+
+# Steps each surfer takes from its random start before visits count
+BURN_IN = 10
+
+# Visited positions buffered before they are tallied
+BUFFER = 1 << 20
+
+# Graph walked by a `parallel_random_walks` worker
+_graph = None
+
+
+def random_walks(graph, damping_factor, samples, walkers=WALKERS, seed=None,
+                 batches=BATCHES, burn_in=BURN_IN):
+    """
+    Estimate the PageRank vector of a `LinkGraph` from about `samples`
+    page visits of `walkers` independent random surfers moving in lockstep.
+
+    Returns the estimate and its standard error per page. The same `seed`
+    always gives the same estimate. For few samples, fewer surfers are
+    used (see `layout`).
+    """
+    rng = np.random.default_rng(seed)
+    walkers, steps, batches = layout(samples, walkers, batches)
+    counts = visit_counts(graph, damping_factor, steps, walkers, rng, batches, burn_in)
+    return estimate(counts)
+
+
+def parallel_random_walks(graph, damping_factor, samples, workers=None, walkers=WALKERS,
+                          seed=None, batches=BATCHES, burn_in=BURN_IN):
+    """
+    Like `random_walks`, but the samples are split evenly across
+    `workers` processes (all cores by default), whose visit counts are
+    merged at the end.
+
+    Every worker draws from its own stream, spawned from a NumPy
+    SeedSequence of `seed`, so the streams are independent and the same
+    `seed` and number of workers always give the same estimate.
+    """
+    workers = workers or os.cpu_count()
+    streams = np.random.SeedSequence(seed).spawn(workers)
+    walkers, steps, batches = layout(-(-samples // workers), walkers, batches)
+    with ProcessPoolExecutor(workers, initializer=_share, initargs=(graph,)) as pool:
+        counts = list(pool.map(
+            _walk, streams, [damping_factor] * workers, [steps] * workers,
+            [walkers] * workers, [batches] * workers, [burn_in] * workers))
+    return estimate(np.concatenate(counts))
+
+
+def layout(samples, walkers=WALKERS, batches=BATCHES):
+    """
+    Returns how to take about `samples` samples: the number of surfers,
+    at most `walkers`, the steps each takes and the number of batches.
+
+    Surfers are cut to about `samples / batches`, so that every batch
+    gets at least one step, and at least 2 batches are always taken, so
+    that there is a standard error.
+    """
+    walkers = max(1, min(walkers, samples // batches))
+    steps = max(2, -(-samples // walkers))
+    return walkers, steps, max(2, min(batches, steps))
+
+
+def visit_counts(graph, damping_factor, steps, walkers, rng, batches=BATCHES, burn_in=BURN_IN):
+    """
+    Walk `walkers` surfers `steps` steps each, drawing from the NumPy
+    Generator `rng`, and return their visits as a (batches, pages) array
+    of counts, one row per consecutive group of steps.
+    """
+    n = len(graph)
+    offsets, targets = graph.offsets, graph.targets
+    out_degree, dangling = graph.out_degree, graph.dangling
+    batches = max(1, min(batches, steps))
+    counts = np.zeros((batches, n), dtype=np.int64)
+
+    def move(pages):
+        # Follow a random link with probability `damping_factor`,
+        # otherwise (and always from dangling pages) jump anywhere
+        follow = (rng.random(walkers) < damping_factor) & ~dangling[pages]
+        moved = rng.integers(0, n, walkers)
+        linking = pages[follow]
+        choice = (rng.random(len(linking)) * out_degree[linking]).astype(np.int64)
+        moved[follow] = targets[offsets[linking] + choice]
+        return moved
+
+    pages = rng.integers(0, n, walkers)
+    for _ in range(burn_in):
+        pages = move(pages)
+
+    # Batch `b` holds the steps from bounds[b] up to bounds[b + 1]
+    bounds = np.linspace(0, steps, batches + 1).astype(np.int64)
+    per_flush = max(1, BUFFER // walkers)
+    for b in range(batches):
+        buffered = []
+        for _ in range(bounds[b], bounds[b + 1]):
+            buffered.append(pages)
+            if len(buffered) == per_flush:
+                counts[b] += np.bincount(np.concatenate(buffered), minlength=n)
+                buffered = []
+            pages = move(pages)
+        if buffered:
+            counts[b] += np.bincount(np.concatenate(buffered), minlength=n)
+    return counts
+
+
+def _share(graph):
+    """
+    Keep the graph of `parallel_random_walks` in a worker. With the fork
+    start method it is inherited rather than copied.
+    """
+    global _graph
+    _graph = graph
+
+
+def _walk(stream, damping_factor, steps, walkers, batches, burn_in):
+    rng = np.random.default_rng(stream)
+    return visit_counts(_graph, damping_factor, steps, walkers, rng, batches, burn_in)
+
+
+def estimate(counts):
+    """
+    Returns the visit frequency of every page and its standard error,
+    from a (batches, pages) array of visit counts.
+    """
+    totals = counts.sum(axis=1, keepdims=True)
+    frequencies = counts / totals
+    rank = counts.sum(axis=0) / totals.sum()
+    if len(counts) < 2:
+        return rank, np.full(counts.shape[1], np.nan)
+    error = frequencies.std(axis=0, ddof=1) / np.sqrt(len(counts))
+    return rank, error
@@ -3,7 +3,12 @@ import random
 import re  # Regular expression operations
 import sys
 
-sys.setrecursionlimit(11000)
+import numpy as np
+
+import crawler
+from linkgraph import (LinkGraph, MAX_ITERATIONS, TOLERANCE, personalized_power_iteration,
+                       power_iteration, update_power_iteration)
+from montecarlo import WALKERS, parallel_random_walks, random_walks
 
 DAMPING = 0.85
 SAMPLES = 10000
@@ -12,12 +17,12 @@ SAMPLES = 10000
 def main():
     if len(sys.argv) != 2:
         sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
+    corpus = crawler.crawl(sys.argv[1], cache=True)
     ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
     print(f"PageRank Results from Sampling (n = {SAMPLES})")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
+    ranks = vector_pagerank(corpus, DAMPING)
     print(f"PageRank Results from Iteration")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
@@ -92,42 +97,105 @@ def sample_pagerank(corpus, damping_factor, n):
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-
-    page_rank = dict()
-    page_sampling = []
-    first_page = random.choice(list(corpus.keys()))
-    page_sampling.append(first_page)
-    new_dist = transition_model(corpus, first_page, damping_factor)
-    pages = sampling(corpus, damping_factor, new_dist, 1, n, page_sampling)
-
-    for p in corpus:
-        number_page = pages.count(p)
-        page_rank[p] = number_page / n
-
-    return page_rank
-
-
-
-def sampling(corpus, damping_factor, prob_dist, i, n, page_sampling):
+    # The transition model of a page mixes two uniform distributions:
+    # one of its links, or any page of the corpus. With the links of every
+    # page precomputed as positions, each step takes at most two random
+    # numbers, and visits are counted as we go instead of stored.
+    pages = list(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+    links = [
+        [index[link] for link in corpus[page] if link in index]
+        for page in pages
+    ]
+
+    visits = [0] * len(pages)
+    draw = random.random
+    page = random.randrange(len(pages))
+    visits[page] += 1
+
+    for _ in range(n - 1):
+        choices = links[page]
+        if choices and draw() < damping_factor:
+            page = choices[int(draw() * len(choices))]
+        else:
+            page = int(draw() * len(pages))
+        visits[page] += 1
+
+    return {page: visits[i] / n for i, page in enumerate(pages)}
+
+
+def personalized_pagerank(corpus, seeds, damping_factor, tolerance=TOLERANCE,
+                          max_iterations=MAX_ITERATIONS):
+    """
+    Return topic-specific PageRank values for each seed in `seeds`, where
+    the random surfer jumps to one of the seed's pages rather than to any
+    page of the corpus. A seed is a collection of pages, jumped to evenly,
+    or a dictionary of page -> weight.
+
+    All seeds are solved together, so one pass over the links per
+    iteration serves the whole batch. Return a list with one dictionary
+    of page -> PageRank value per seed, in order. Raises ValueError for
+    seeds with pages outside the corpus, or with no weight at all.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    seeds = list(seeds)
+    teleport = np.zeros((len(graph), len(seeds)))
+    for j, seed in enumerate(seeds):
+        weights = seed if isinstance(seed, dict) else dict.fromkeys(seed, 1)
+        for page, weight in weights.items():
+            if page not in graph.index:
+                raise ValueError(f"Seed {j} has page {page}, which is not in the corpus")
+            teleport[graph.index[page], j] = weight
+        if not teleport[:, j].any():
+            raise ValueError(f"Seed {j} has no pages in the corpus")
+    ranks, _ = personalized_power_iteration(
+        graph, teleport, damping_factor, tolerance, max_iterations)
+    return [graph.ranks(ranks[:, j]) for j in range(len(seeds))]
+
+
+def update_pagerank(corpus, ranks, changes, damping_factor, tolerance=TOLERANCE,
+                    max_iterations=MAX_ITERATIONS):
     """
-    For a given n the sampling function returns  a list that documents how many times each page of the corpus
-    was chosen randomly by regarding its probability distribution.
+    Return the PageRank values of `corpus` after `changes`, given its
+    PageRank values `ranks` from before them.
+
+    `changes` maps added or relinked pages to their new set of links,
+    and removed pages to None. The corpus is updated in place. Iteration
+    starts from the old values, so small edits take a fraction of the
+    iterations of `vector_pagerank`, but the corpus is compiled every
+    time. Processes that apply a stream of changes should keep a
+    `LinkGraph` and rank vector and use `update_power_iteration` instead.
     """
-    if i < n:
-        sequence = []
-        probabilities = []
-        for p in prob_dist:
-            sequence.append(p)
-            probabilities.append(prob_dist[p])
-        list_page = random.choices(sequence, weights=probabilities, k=1)
-        for q in list_page:
-            page = q
-        page_sampling.append(page)
-        i += 1
-        return sampling(corpus, damping_factor, transition_model(corpus, page, damping_factor), i, n, page_sampling)
+    graph = LinkGraph.from_corpus(corpus)
+    rank = np.array([ranks[page] for page in graph.pages])
+    graph, rank, _ = update_power_iteration(
+        graph, rank, changes, damping_factor, tolerance, max_iterations)
+    for page, links in changes.items():
+        if links is None:
+            corpus.pop(page, None)
+        else:
+            corpus[page] = set(links)
+    return graph.ranks(rank)
+
+
+def walker_pagerank(corpus, damping_factor, n, walkers=WALKERS, seed=None, workers=1):
+    """
+    Return PageRank values estimated from about `n` samples like
+    `sample_pagerank`, but taken by `walkers` random surfers that move
+    together in vectorized NumPy steps, and the standard error of each.
+    With more than one of `workers`, the samples are split across that
+    many processes (None for all cores).
+
+    Return two dictionaries where keys are page names: the estimated
+    PageRank values, which sum to 1, and their standard errors.
+    The same `seed` (and number of workers) always gives the same estimate.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    if workers == 1:
+        rank, error = random_walks(graph, damping_factor, n, walkers, seed)
     else:
-        print(page_sampling)
-        return page_sampling
+        rank, error = parallel_random_walks(graph, damping_factor, n, workers, walkers, seed)
+    return graph.ranks(rank), graph.ranks(error)
 
 
 def iterate_pagerank(corpus, damping_factor):
@@ -173,32 +241,38 @@ def iterate_pagerank(corpus, damping_factor):
     return page_rank
 
 
+def vector_pagerank(corpus, damping_factor, tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS,
+                    **options):
+    """
+    Return the PageRank values of `iterate_pagerank`, computed by NumPy
+    power iteration over the corpus compiled to a `LinkGraph`.
+
+    Iteration stops once the rank vector changes by less than `tolerance`
+    in L1 norm, or after `max_iterations`. Unlike `iterate_pagerank`,
+    the corpus is left unchanged. Other `options` (norm, method,
+    extrapolation and a trace hook) are passed on to `power_iteration`.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    rank, _ = power_iteration(graph, damping_factor, tolerance, max_iterations, **options)
+    return graph.ranks(rank)
+
+
 def iteration(corpus, links, pagerank_dist, section_1, damping_factor, new_page_rank):
-    if new_page_rank:
-        for s in new_page_rank:
-            if abs(new_page_rank[s] - pagerank_dist[s]) < 0.001:
-                return new_page_rank
-            else:
-                pagerank_dist = new_page_rank.copy()
-                for page in links:
-                    section_2 = 0
-                    for j in links[page]:
-                        section_2 = section_2 + (pagerank_dist[j] / len(corpus[j]))
-                        new_page_rank[page] = section_1 + damping_factor * section_2
-                a = 0
-                for l in new_page_rank:
-                    a = a + new_page_rank[l]
-                return iteration(corpus, links, pagerank_dist, section_1, damping_factor, new_page_rank)
-    else:
-        for page in links:
+    """
+    Update the PageRank values until no page at all changes by 0.001 or
+    more, and return them. Pages nobody links to keep the value of the
+    random jump alone.
+    """
+    while True:
+        new_page_rank = dict()
+        for page in corpus:
             section_2 = 0
-            for j in links[page]:
+            for j in links.get(page, ()):
                 section_2 = section_2 + (pagerank_dist[j] / len(corpus[j]))
-                new_page_rank[page] = section_1 + damping_factor * section_2
-        a = 0
-        for l in new_page_rank:
-            a = a + new_page_rank[l]
-        return iteration(corpus, links, pagerank_dist, section_1, damping_factor, new_page_rank)
+            new_page_rank[page] = section_1 + damping_factor * section_2
+        if all(abs(new_page_rank[p] - pagerank_dist[p]) < 0.001 for p in corpus):
+            return new_page_rank
+        pagerank_dist = new_page_rank
 
 
 if __name__ == "__main__":
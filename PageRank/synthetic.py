@@ -0,0 +1,97 @@
+import argparse
+import itertools
+import os
+import random
+
+PAGE = """<!DOCTYPE html>
+<html lang="en">
+    <head>
+        <title>{title}</title>
+    </head>
+    <body>
+        <h1>{title}</h1>
+
+        <div>Links:</div>
+        <ul>
+{links}
+        </ul>
+    </body>
+</html>
+"""
+
+LINK = """            <li><a href="{target}">{title}</a></li>"""
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        usage="python synthetic.py directory [--pages N] [--links N] [--dangling F] [--seed S]",
+        description="Write a synthetic corpus of HTML pages in the format of corpus0/.")
+    parser.add_argument("directory")
+    parser.add_argument("--pages", type=int, default=10000)
+    parser.add_argument("--links", type=float, default=8,
+                        help="mean number of links of pages that have any")
+    parser.add_argument("--dangling", type=float, default=0.1,
+                        help="fraction of pages without links")
+    parser.add_argument("--exponent", type=float, default=0.8,
+                        help="power-law exponent of how often pages are linked to")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate(args.directory, args.pages, args.links, args.dangling, args.exponent, args.seed)
+    print(f"Wrote {args.pages} pages to {args.directory}")
+
+
+def generate(directory, pages, links=8, dangling=0.1, exponent=0.8, seed=0):
+    """
+    Write `pages` HTML pages named 1.html, 2.html, ... to `directory`.
+    """
+    corpus = link_graph(pages, links, dangling, exponent, seed)
+    os.makedirs(directory, exist_ok=True)
+    for page, targets in corpus.items():
+        with open(os.path.join(directory, page), "w", encoding="utf-8") as f:
+            f.write(PAGE.format(title=page[:-len(".html")], links="\n".join(
+                LINK.format(target=target, title=target[:-len(".html")])
+                for target in sorted(targets, key=_number))))
+
+
+def link_graph(pages, links=8, dangling=0.1, exponent=0.8, seed=0):
+    """
+    Returns a `crawl` dictionary of `pages` pages without writing them.
+
+    A `dangling` fraction of the pages has no links, and the others a
+    geometrically distributed number of them with mean `links`. Targets
+    are drawn with weight rank^-exponent, so the in-degree follows a
+    power law and a few pages are linked to by very many. Every call
+    with the same arguments returns the same corpus.
+    """
+    rng = random.Random(seed)
+    names = [f"{page + 1}.html" for page in range(pages)]
+
+    # Shuffle ranks so popular pages are spread over the names
+    ranking = names[:]
+    rng.shuffle(ranking)
+    popularity = list(itertools.accumulate(
+        (rank + 1) ** -exponent for rank in range(pages)))
+
+    corpus = {}
+    for page in names:
+        count = 0
+        if rng.random() >= dangling:
+            count = 1
+            while count < pages - 1 and rng.random() > 1 / links:
+                count += 1
+        targets = set(rng.choices(ranking, cum_weights=popularity, k=count)) if count else set()
+        targets.discard(page)
+        corpus[page] = targets
+    return corpus
+
+
+def _number(page):
+    """
+    Sorts pages by the number in their name.
+    """
+    return int(page[:-len(".html")])
+
+
+if __name__ == "__main__":
+    main()